@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Project, Technician, ProjectNote, Status
+from .models import History, OutboxMessage, Project, Subscription, Technician, ProjectNote, Status
+
+class SubscriptionInline(admin.TabularInline):
+    model = Subscription
+    fields = ('email', 'user',)
+    raw_id_fields = ('user',)
+    extra = 1
 
 class ProjectAdmin(admin.ModelAdmin):
     list_display=('title', 'technician', 'status',)
@@ -11,8 +17,8 @@ class ProjectAdmin(admin.ModelAdmin):
         'created_by',
         'begin',
         'status',
-        'recipient_emails'
     )
+    inlines = [SubscriptionInline]
 
 admin.site.register(Project, ProjectAdmin)
 
@@ -27,3 +33,21 @@ class StatusAdmin(admin.ModelAdmin):
     list_display=('name', 'is_active', 'is_default',)
 
 admin.site.register(Status, StatusAdmin)
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display=('subject', 'status', 'attempts', 'next_attempt', 'sent',)
+    list_filter=('status',)
+
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
+
+class HistoryAdmin(admin.ModelAdmin):
+    list_display=('__str__', 'user', 'when',)
+    list_filter=('modelname',)
+    list_select_related=('user',)
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        changelist.result_list.resolve_objects()
+        return changelist
+
+admin.site.register(History, HistoryAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProsdibConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prosdib'
+
+    def ready(self):
+        from . import signals
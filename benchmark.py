@@ -0,0 +1,131 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Project, Status
+from .seed import seed_data
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def check_response(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"Benchmark request failed with status {response.status_code}")
+
+
+def measure(request, repeat, memory_repeat=3):
+    """Call request() repeat times and return its latency percentiles, query count and peak memory
+
+    The query count and peak memory come from memory_repeat further calls, so that neither the memory tracing
+    nor the query capturing is included in the latencies
+    """
+    timings = []
+    for number in range(repeat):
+        start = time.perf_counter()
+        response = request()
+        timings.append(time.perf_counter() - start)
+        check_response(response)
+
+    queries = []
+    peaks = []
+    for number in range(memory_repeat):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        queries.append(len(context.captured_queries))
+        check_response(response)
+
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "queries": max(queries),
+        "peak_memory_kb": round(max(peaks) / 1024, 1),
+    }
+
+
+def get_view_requests(client, project, status):
+    project_data = {
+        "title": "Benchmark Project",
+        "begin": "2024-01-01T00:00:00",
+        "priority": 3,
+        "status": status.pk,
+        "recipient_emails": "",
+        "projectnote_set-TOTAL_FORMS": 0,
+        "projectnote_set-INITIAL_FORMS": 0,
+        "projectnote_set-MIN_NUM_FORMS": 0,
+        "projectnote_set-MAX_NUM_FORMS": 1000,
+    }
+
+    return {
+        "project-list": lambda: client.get(reverse("prosdib:project-list")),
+        "project-detail": lambda: client.get(reverse("prosdib:project-detail", kwargs={"pk": project.pk})),
+        "project-create": lambda: client.post(reverse("prosdib:project-create"), project_data),
+        "project-update": lambda: client.post(
+            reverse("prosdib:project-update", kwargs={"pk": project.pk}),
+            {**project_data, "title": project.title},
+        ),
+        "projectprojectnote-create": lambda: client.post(
+            reverse("prosdib:projectprojectnote-create", kwargs={"projectpk": project.pk}),
+            {"when": "2024-01-01 00:00:00", "maintext": "Benchmark note", "details": "", "time_spent": "0.25", "is_current": "on"},
+        ),
+    }
+
+
+def run_benchmark(sizes, notes_per_project=10, repeat=20, seed=0):
+    """Seed each data size in a transaction that is rolled back and measure the prosdib views
+
+    Returns:
+        A report dict, keyed by data size and then by view name
+    """
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat, "sizes": {}}
+
+    for size in sizes:
+        with transaction.atomic():
+            counts = seed_data(projects=size, notes_per_project=notes_per_project, histories_per_project=2, seed=seed)
+            user = get_user_model().objects.create_superuser("prosdib-benchmark", "", None)
+            client = Client()
+            client.force_login(user)
+
+            project = Project.objects.filter(title__startswith="Seed Project ").order_by("pk").first()
+            requests = get_view_requests(client, project, Status.objects.first())
+
+            report["sizes"][str(size)] = {
+                "counts": counts,
+                "views": {name: measure(request, repeat) for name, request in requests.items()},
+            }
+
+            transaction.set_rollback(True)
+
+    return report
+
+
+def compare_reports(previous, current):
+    """Yield (size, view, metric, previous value, current value) for the measurements in both reports"""
+    for size, current_size in current["sizes"].items():
+        previous_views = previous.get("sizes", {}).get(size, {}).get("views", {})
+        for view, metrics in current_size["views"].items():
+            for metric, value in metrics.items():
+                if metric in previous_views.get(view, {}):
+                    yield size, view, metric, previous_views[view][metric], value
+
+
+def write_report(report, path):
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+
+def read_report(path):
+    with open(path) as report_file:
+        return json.load(report_file)
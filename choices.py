@@ -0,0 +1,72 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models import Technician
+from .registry import status_registry
+
+
+def get_timeout():
+    return getattr(settings, "PROSDIB_CHOICES_CACHE_TIMEOUT", 300)
+
+
+class CachedChoices:
+    """The (pk, label) choices of a model, kept in the default cache until invalidate() is called (see signals.py)
+
+    Entries also expire after PROSDIB_CHOICES_CACHE_TIMEOUT seconds, so a change missed by the signals, such as
+    one made in another process with a per-process cache, is picked up eventually.  If limit is given and there are more rows than that, get_choices() returns None, and forms should use an
+    autocomplete widget instead of listing the choices
+    """
+
+    def __init__(self, name, get_queryset, limit=None):
+        self.version_key = f"prosdib:choices:{name}:version"
+        self.get_queryset = get_queryset
+        self.limit = limit
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, get_timeout())
+
+    def get_limit(self):
+        return self.limit() if callable(self.limit) else self.limit
+
+    def load(self):
+        queryset = self.get_queryset()
+        limit = self.get_limit()
+        if limit is not None:
+            queryset = queryset[: limit + 1]
+
+        choices = [(obj.pk, str(obj)) for obj in queryset]
+        if limit is not None and len(choices) > limit:
+            return None
+
+        return choices
+
+    def get_choices(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, get_timeout())
+            version = cache.get(self.version_key)
+
+        # None is a valid result (too many choices), so it is stored in a tuple
+        return cache.get_or_set(f"{self.version_key}:{version}", lambda: (self.load(),), get_timeout())[0]
+
+
+class StatusChoices:
+    """The (pk, label) choices of statuses, from the status registry, which is already cached"""
+
+    def invalidate(self):
+        status_registry.invalidate()
+
+    def get_choices(self):
+        return [(status.pk, str(status)) for status in status_registry.get_statuses()]
+
+
+technician_choices = CachedChoices("technician", lambda: Technician.objects.order_by("pk"))
+status_choices = StatusChoices()
+user_choices = CachedChoices(
+    "user",
+    lambda: get_user_model().objects.order_by(get_user_model().USERNAME_FIELD),
+    limit=lambda: getattr(settings, "PROSDIB_USER_CHOICES_LIMIT", 1000),
+)
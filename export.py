@@ -0,0 +1,70 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+PROJECT_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "priority",
+    "begin",
+    "technician",
+    "created_by",
+    "status",
+    "recipient_emails",
+    "latest_update_when",
+    "latest_update_text",
+    "qty_current_notes",
+    "time_spent_total",
+]
+NOTE_FIELDS = ["id", "when", "maintext", "details", "time_spent", "is_current", "submitted_by"]
+
+
+class Echo:
+    """A file-like object which returns what is written to it, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def get_value(obj, field_name):
+    if field_name == "recipient_emails":
+        return ",".join(obj.get_recipient_emails())
+
+    value = getattr(obj, field_name)
+    if field_name in ("technician", "created_by", "status", "submitted_by"):
+        return str(value) if value is not None else ""
+    return value
+
+
+def export_csv_rows(projects, include_notes=False):
+    """Yield CSV lines for the projects, with one line per note if include_notes is True"""
+    writer = csv.writer(Echo())
+
+    header = PROJECT_FIELDS + ([f"note_{field_name}" for field_name in NOTE_FIELDS] if include_notes else [])
+    yield writer.writerow(header)
+
+    for project in projects:
+        project_values = [get_value(project, field_name) for field_name in PROJECT_FIELDS]
+        if not include_notes:
+            yield writer.writerow(project_values)
+            continue
+
+        notes = project.projectnote_set.all()
+        if not notes:
+            yield writer.writerow(project_values + [""] * len(NOTE_FIELDS))
+        for note in notes:
+            yield writer.writerow(project_values + [get_value(note, field_name) for field_name in NOTE_FIELDS])
+
+
+def export_jsonl_rows(projects, include_notes=False):
+    """Yield one JSON object per line for each project, with a list of its notes if include_notes is True"""
+    for project in projects:
+        data = {field_name: get_value(project, field_name) for field_name in PROJECT_FIELDS}
+        if include_notes:
+            data["notes"] = [
+                {field_name: get_value(note, field_name) for field_name in NOTE_FIELDS}
+                for note in project.projectnote_set.all()
+            ]
+        yield json.dumps(data, cls=DjangoJSONEncoder) + "\n"
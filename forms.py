@@ -1,6 +1,10 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.forms import inlineformset_factory
-from .models import Project, ProjectNote, Technician
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from django.urls import reverse_lazy
+from .choices import status_choices, technician_choices, user_choices
+from .models import Project, ProjectNote, Subscription, Technician
 
 
 class ItemSelect(forms.Select):
@@ -29,9 +33,138 @@ class ItemSelect(forms.Select):
         return option
 
 
+class AutocompleteSelect(forms.Select):
+    """A select for a ModelChoiceField which renders only the selected choice
+
+    Other choices are fetched from a json autocomplete endpoint (see AutocompleteView) as the user types,
+    so the choices are never all loaded.  For a libtekin item field, use
+    AutocompleteSelect(url=reverse_lazy("prosdib:item-autocomplete"))
+    """
+
+    url = None
+
+    def __init__(self, attrs=None, url=None):
+        super().__init__(attrs)
+        if url is not None:
+            self.url = url
+
+    class Media:
+        js = ("prosdib/autocomplete.js",)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-autocomplete-url"] = str(self.url)
+        context["widget"]["attrs"]["class"] = " ".join(
+            filter(None, [context["widget"]["attrs"].get("class"), "autocompleteselect"])
+        )
+        return context
+
+    def get_selected_objects(self, values):
+        try:
+            return list(self.choices.queryset.filter(pk__in=values))
+        except (ValueError, ValidationError):
+            return []
+
+    def optgroups(self, name, value, attrs=None):
+        values = [selected for selected in value if selected not in ("", None)]
+        options = []
+
+        if self.choices.field.empty_label is not None:
+            options.append(self.create_option(name, "", self.choices.field.empty_label, not values, 0))
+
+        for obj in self.get_selected_objects(values):
+            options.append(
+                self.create_option(
+                    name,
+                    ModelChoiceIteratorValue(self.choices.field.prepare_value(obj), obj),
+                    self.choices.field.label_from_instance(obj),
+                    True,
+                    len(options),
+                )
+            )
+
+        return [(None, options, 0)]
+
+
+class UserAutocompleteSelect(AutocompleteSelect):
+    url = reverse_lazy("prosdib:user-autocomplete")
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    """Iterate over the cached choices of the field instead of its queryset"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for pk, label in self.field.get_cached_choices() or []:
+            yield (ModelChoiceIteratorValue(pk, None), label)
+
+    def __len__(self):
+        return len(self.field.get_cached_choices() or []) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.get_cached_choices())
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """A ModelChoiceField whose choices come from a cached choices provider (see choices.py)
+
+    Submitted values are checked against the cached ids before the object is read.  A value missing from
+    the cached ids is looked up in the database before it is rejected, and if it is found the cached choices,
+    which must be stale, are invalidated.  If the provider has too many choices to list it returns None,
+    and the field behaves as a plain ModelChoiceField
+    """
+
+    iterator = CachedModelChoiceIterator
+    cached_choices = None
+
+    def get_cached_choices(self):
+        return self.cached_choices.get_choices()
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+
+        choices = self.get_cached_choices()
+        if choices is None or str(getattr(value, "pk", value)) in {str(pk) for pk, label in choices}:
+            return super().to_python(value)
+
+        # raises invalid_choice if the value is not in the database either
+        obj = super().to_python(value)
+        self.cached_choices.invalidate()
+        return obj
+
+
+class TechnicianChoiceField(CachedModelChoiceField):
+    cached_choices = technician_choices
+
+
+class StatusChoiceField(CachedModelChoiceField):
+    cached_choices = status_choices
+
+
+class UserChoiceField(CachedModelChoiceField):
+    cached_choices = user_choices
+
+
 class ProjectForm(forms.ModelForm):
+    recipient_emails = forms.CharField(
+        label="recipient emails",
+        required=False,
+        widget=forms.Textarea(),
+        help_text="The comma-separated list of emails of those who should get updates on this project.  By default, emails are sent for changes in notes and resolution status",
+    )
+
     def __init__(self, **kwargs):
-        return super().__init__(**kwargs)
+        super().__init__(**kwargs)
+        if self.instance.pk is not None and "recipient_emails" not in self.initial:
+            self.initial["recipient_emails"] = ",\n".join(self.instance.get_recipient_emails())
+
+    def save_subscriptions(self, project, emails=None):
+        """Make the subscriptions of the project match the recipient emails of the form, or the given emails"""
+        if emails is None:
+            emails = self.cleaned_data["recipient_emails"]
+        Subscription.objects.set_project_emails(project, emails)
 
     class Meta:
         model = Project
@@ -43,8 +176,11 @@ class ProjectForm(forms.ModelForm):
             "technician",
             "status",
             "status",
-            "recipient_emails",
         ]
+        field_classes = {
+            "technician": TechnicianChoiceField,
+            "status": StatusChoiceField,
+        }
         widgets = {
             "title": forms.TextInput(attrs={"class": "widthlong"}),
             "description": forms.Textarea(attrs={"class": "widthlong"}),
@@ -54,6 +190,11 @@ class ProjectForm(forms.ModelForm):
         }
 
 
+class SubscriptionChangeForm(forms.Form):
+    action = forms.ChoiceField(choices=(("subscribe", "subscribe"), ("unsubscribe", "unsubscribe")))
+    project = forms.ModelMultipleChoiceField(queryset=Project.objects.order_by())
+
+
 class ProjectProjectNoteForm(forms.ModelForm):
     class Meta:
         model = ProjectNote
@@ -71,6 +212,15 @@ class ProjectProjectNoteForm(forms.ModelForm):
 
 
 class TechnicianForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # past PROSDIB_USER_CHOICES_LIMIT users, the user is chosen by searching instead of from a list
+        if user_choices.get_choices() is None:
+            user_field = self.fields["user"]
+            user_field.widget = UserAutocompleteSelect()
+            user_field.widget.is_required = user_field.required
+            user_field.widget.choices = user_field.choices
+
     class Meta:
         model = Technician
         fields = [
@@ -78,8 +228,16 @@ class TechnicianForm(forms.ModelForm):
             "name",
             "is_current",
         ]
+        field_classes = {
+            "user": UserChoiceField,
+        }
 
 
 ProjectProjectNoteFormset = inlineformset_factory(
     Project, ProjectNote, form=ProjectProjectNoteForm, extra=10
 )
+
+# used on the update page when PROSDIB_RECENT_NOTES is set; more blank forms are added client side
+ProjectProjectNoteRecentFormset = inlineformset_factory(
+    Project, ProjectNote, form=ProjectProjectNoteForm, extra=1
+)
@@ -0,0 +1,148 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger("prosdib.instrumentation")
+
+FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(sql):
+    """Reduce an SQL statement to its shape, so repeats of the same query with other values match"""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryInstrument:
+    """Record the SQL run on every database connection while it is active
+
+    Use it as a context manager.  Afterwards, queries holds a (sql, seconds) tuple per query
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._exit_stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        for connection in connections.all():
+            self._exit_stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._exit_stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for sql, duration in self.queries)
+
+    def get_duplicates(self):
+        """Return a dict of each query fingerprint that was run more than once, and how many times"""
+        counts = Counter(fingerprint(sql) for sql, duration in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+class QueryInstrumentationMiddleware:
+    """Record the queries and render time of prosdib views when PROSDIB_INSTRUMENTATION is set
+
+    The results are logged to the prosdib.instrumentation logger and added to the response as X-Prosdib-* headers.
+    Views that run more queries than allowed by PROSDIB_QUERY_BUDGETS (a dict of url name to query count)
+    are logged as warnings
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "PROSDIB_INSTRUMENTATION", False):
+            return self.get_response(request)
+
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        if "prosdib" not in match.namespaces:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with QueryInstrument() as instrument:
+            response = self.get_response(request)
+        total_time = time.perf_counter() - start
+
+        render_time = getattr(request, "_prosdib_render_end", 0) - getattr(request, "_prosdib_render_start", 0)
+        duplicates = instrument.get_duplicates()
+
+        response["X-Prosdib-View"] = match.url_name or ""
+        response["X-Prosdib-Queries"] = instrument.count
+        response["X-Prosdib-Query-Time-Ms"] = f"{instrument.total_time * 1000:.2f}"
+        response["X-Prosdib-Duplicate-Queries"] = sum(count - 1 for count in duplicates.values())
+        response["X-Prosdib-Render-Time-Ms"] = f"{render_time * 1000:.2f}"
+
+        logger.info(
+            "%s %s: %d queries in %.2f ms, %d duplicated, render %.2f ms, total %.2f ms",
+            request.method,
+            match.view_name,
+            instrument.count,
+            instrument.total_time * 1000,
+            len(duplicates),
+            render_time * 1000,
+            total_time * 1000,
+        )
+        for sql, count in duplicates.items():
+            logger.debug("%s ran %d times: %s", match.view_name, count, sql)
+
+        budget = getattr(settings, "PROSDIB_QUERY_BUDGETS", {}).get(match.url_name)
+        if budget is not None and instrument.count > budget:
+            logger.warning(
+                "%s ran %d queries, over its budget of %d", match.view_name, instrument.count, budget
+            )
+
+        return response
+
+    def process_template_response(self, request, response):
+        request._prosdib_render_start = time.perf_counter()
+
+        def end_render(response):
+            request._prosdib_render_end = time.perf_counter()
+
+        response.add_post_render_callback(end_render)
+        return response
+
+
+class QueryBudgetMixin:
+    """TestCase mixin with an assertion that a block of code stays within a query budget"""
+
+    @contextmanager
+    def assertQueryBudget(self, budget, allow_duplicates=True):
+        with QueryInstrument() as instrument:
+            yield instrument
+
+        duplicates = instrument.get_duplicates()
+        details = "\n".join(f"{count} x {sql}" for sql, count in duplicates.items())
+        if instrument.count > budget:
+            self.fail(f"{instrument.count} queries run, over the budget of {budget}\n{details}")
+        if not allow_duplicates and duplicates:
+            self.fail(f"Duplicated queries run\n{details}")
@@ -0,0 +1,235 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from .models import DigestEvent, OutboxMessage, Project, get_current_notes_prefetch
+
+# how long a claimed message is hidden from other senders while it is being sent
+CLAIM_SECONDS = 300
+
+
+def get_from_email():
+    return getattr(settings, "PROSDIB_EMAIL_FROM", None) or settings.DEFAULT_FROM_EMAIL
+
+
+def compose_project_mail(project_pk, project_url, is_new=False):
+    """Return the subject, plain text and html of the email about a project
+
+    The project and its status and technicians are read in one query.  The rendered message is cached
+    per project version, so the current notes are only read and the templates only rendered once per
+    version of the project
+    """
+    project = Project.objects.select_related("status", "technician", "created_by").get(pk=project_pk)
+
+    cache_key = "prosdib:project-mail:{}:{}:{}:{}".format(
+        project.pk,
+        project.version,
+        int(is_new),
+        hashlib.md5(project_url.encode()).hexdigest(),
+    )
+    composed = cache.get(cache_key)
+    if composed is None:
+        prefetch_related_objects([project], get_current_notes_prefetch())
+        context = {
+            "project": project,
+            "project_url": project_url,
+            "is_new": is_new,
+            "notes": project.prefetched_current_notes,
+        }
+        composed = (
+            f"Tech Project { 'Submitted' if is_new else 'Updated' }: { project.title }",
+            # get_template returns the compiled template from the engine's cached loader
+            get_template("prosdib/mail/project.txt").render(context),
+            get_template("prosdib/mail/project.html").render(context),
+        )
+        cache.set(cache_key, composed, getattr(settings, "PROSDIB_MAIL_CACHE_TIMEOUT", 3600))
+
+    return composed
+
+
+def queue_mail(subject, message, from_email, recipients, html_message="", project=None):
+    """Add an email to the outbox, to be sent by the prosdib_send_outbox command
+
+    The outbox row is written with the current connection, so when this is called inside a
+    transaction the email is only queued if the transaction is committed
+    """
+    return OutboxMessage.objects.create(
+        project=project,
+        subject=subject,
+        message=message,
+        html_message=html_message or "",
+        from_email=from_email,
+        recipients=",".join(recipients),
+    )
+
+
+def claim_outbox_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        pks = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.STATUS_PENDING, next_attempt__lte=now)
+            .order_by("next_attempt")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=pks).update(
+            next_attempt=now + timedelta(seconds=CLAIM_SECONDS)
+        )
+
+    return OutboxMessage.objects.filter(pk__in=pks)
+
+
+def record_outbox_failure(outbox_message, error, max_attempts, retry_delay):
+    outbox_message.attempts = outbox_message.attempts + 1
+    outbox_message.last_error = str(error)
+    if outbox_message.attempts >= max_attempts:
+        outbox_message.status = OutboxMessage.STATUS_DEAD
+    else:
+        outbox_message.next_attempt = timezone.now() + timedelta(
+            seconds=retry_delay * 2 ** (outbox_message.attempts - 1)
+        )
+    outbox_message.save(
+        update_fields=["attempts", "last_error", "status", "next_attempt"]
+    )
+
+
+def send_outbox(batch_size=50, max_attempts=None, retry_delay=None):
+    """Send one batch of due outbox messages over a single mail connection
+
+    Failed messages are retried with an exponential backoff starting at retry_delay seconds.
+    After max_attempts failures they are marked as failed and are no longer retried
+
+    Returns:
+        A tuple of the number of messages sent and the number that failed
+    """
+    if max_attempts is None:
+        max_attempts = getattr(settings, "PROSDIB_OUTBOX_MAX_ATTEMPTS", 5)
+    if retry_delay is None:
+        retry_delay = getattr(settings, "PROSDIB_OUTBOX_RETRY_DELAY", 60)
+
+    outbox_messages = list(claim_outbox_batch(batch_size))
+    if not outbox_messages:
+        return 0, 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for outbox_message in outbox_messages:
+            record_outbox_failure(outbox_message, e, max_attempts, retry_delay)
+        return 0, len(outbox_messages)
+
+    sent_pks = []
+    failed = 0
+    try:
+        for outbox_message in outbox_messages:
+            email = EmailMultiAlternatives(
+                outbox_message.subject,
+                outbox_message.message,
+                outbox_message.from_email,
+                outbox_message.get_recipients(),
+                connection=connection,
+            )
+            if outbox_message.html_message:
+                email.attach_alternative(outbox_message.html_message, "text/html")
+
+            try:
+                email.send()
+            except Exception as e:
+                record_outbox_failure(outbox_message, e, max_attempts, retry_delay)
+                failed = failed + 1
+            else:
+                sent_pks.append(outbox_message.pk)
+    finally:
+        connection.close()
+
+    OutboxMessage.objects.filter(pk__in=sent_pks).update(
+        status=OutboxMessage.STATUS_SENT, sent=timezone.now()
+    )
+
+    return len(sent_pks), failed
+
+
+def is_digest_mode():
+    return getattr(settings, "PROSDIB_MAIL_DIGEST", False)
+
+
+def queue_digest_events(project, recipients, project_url="", is_new=False):
+    """Record a change to a project for each recipient, to be included in their next digest"""
+    return DigestEvent.objects.bulk_create(
+        [
+            DigestEvent(project=project, email=email, project_url=project_url, is_new=is_new)
+            for email in dict.fromkeys(recipients)
+            if email
+        ]
+    )
+
+
+def get_digest_projects(events):
+    """Group the events of one recipient by project, in the order the projects were first changed"""
+    projects = {}
+    for event in events:
+        if event.project_id not in projects:
+            projects[event.project_id] = {
+                "project": event.project,
+                "project_url": event.project_url,
+                "is_new": False,
+                "changes": 0,
+            }
+        projects[event.project_id]["is_new"] = projects[event.project_id]["is_new"] or event.is_new
+        projects[event.project_id]["changes"] = projects[event.project_id]["changes"] + 1
+
+    return list(projects.values())
+
+
+def send_digests(until=None):
+    """Queue one outbox message per recipient summarizing every project changed since their last digest
+
+    The events, with their projects, are read in a single query and removed in the same transaction
+    in which the messages are queued
+
+    Returns:
+        The number of digest messages queued
+    """
+    if until is None:
+        until = timezone.now()
+
+    with transaction.atomic():
+        events = list(
+            DigestEvent.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("project", "project__status", "project__technician")
+            .filter(created__lte=until)
+            .order_by("email", "created")
+        )
+        if not events:
+            return 0
+
+        events_by_email = {}
+        for event in events:
+            events_by_email.setdefault(event.email, []).append(event)
+
+        from_email = get_from_email()
+        outbox_messages = []
+        for email, recipient_events in events_by_email.items():
+            context = {"projects": get_digest_projects(recipient_events)}
+            outbox_messages.append(
+                OutboxMessage(
+                    subject=f"Tech Project Digest: { len(context['projects']) } project{ '' if len(context['projects']) == 1 else 's' } changed",
+                    message=render_to_string("prosdib/mail/digest.txt", context),
+                    html_message=render_to_string("prosdib/mail/digest.html", context),
+                    from_email=from_email,
+                    recipients=email,
+                )
+            )
+
+        OutboxMessage.objects.bulk_create(outbox_messages)
+        DigestEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+    return len(outbox_messages)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from prosdib.benchmark import compare_reports, read_report, run_benchmark, write_report
+
+
+class Command(BaseCommand):
+    help = 'Measure the latency, query count and memory of the prosdib views against seeded data of several sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 10000],
+            help='The numbers of projects to seed, one run per size',
+        )
+        parser.add_argument('--notes-per-project', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20, help='The number of requests made per view')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='prosdib_benchmark.json', help='The path of the JSON report to write')
+        parser.add_argument('--compare', help='The path of a previous JSON report to compare against')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            report = run_benchmark(
+                options['sizes'],
+                notes_per_project=options['notes_per_project'],
+                repeat=options['repeat'],
+                seed=options['seed'],
+            )
+        finally:
+            teardown_test_environment()
+
+        for size, size_report in report['sizes'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{size} projects'))
+            for view, metrics in size_report['views'].items():
+                self.stdout.write(
+                    f"{view:28} p50 {metrics['p50_ms']:9.2f} ms  p95 {metrics['p95_ms']:9.2f} ms  "
+                    f"{metrics['queries']:4} queries  {metrics['peak_memory_kb']:10.1f} KiB"
+                )
+
+        write_report(report, options['output'])
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {options['compare']}"))
+            for size, view, metric, previous, current in compare_reports(read_report(options['compare']), report):
+                change = (current - previous) / previous * 100 if previous else 0
+                self.stdout.write(f'{size:>8} {view:28} {metric:15} {previous:>12} -> {current:<12} ({change:+.1f}%)')
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from prosdib.models import History, Project, get_current_notes_prefetch
+from prosdib.seed import seed_data
+from prosdib.views import VistaProjectQuerySet
+
+
+class Command(BaseCommand):
+    help = 'Seed a large dataset in a transaction that is rolled back, and print the query plans and timings of the hot project queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=5000)
+        parser.add_argument('--notes-per-project', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20, help='The number of times each query is timed')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = seed_data(
+                projects=options['projects'],
+                notes_per_project=options['notes_per_project'],
+                histories_per_project=2,
+                seed=options['seed'],
+            )
+            self.stdout.write(f'Seeded {counts}')
+
+            project = Project.objects.filter(qty_current_notes__gt=0).first()
+
+            querysets = {
+                'project manager': Project.objects.all()[:30],
+                'project manager with activity': Project.objects.with_activity()[:30],
+                'project manager with live activity': Project.objects.with_activity(live=True)[:30],
+                'project get': Project.objects.filter(pk=project.pk),
+                'project list': VistaProjectQuerySet(model=Project).with_activity()
+                    .filter(status__is_active=True)
+                    .select_related('technician', 'status')[:30],
+                'project list notes prefetch': get_current_notes_prefetch().queryset
+                    .filter(project__in=Project.objects.with_activity().values('pk')[:30]),
+                'project detail notes': project.projectnote_set.all(),
+                'project history': History.objects.for_object('Project', project.pk)[:50],
+            }
+
+            for name, queryset in querysets.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(queryset.explain())
+
+                timings = []
+                for repeat in range(options['repeat']):
+                    start = time.perf_counter()
+                    list(queryset.all())
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                self.stdout.write(
+                    f'best {timings[0] * 1000:.2f} ms, median {timings[len(timings) // 2] * 1000:.2f} ms'
+                )
+
+            transaction.set_rollback(True)
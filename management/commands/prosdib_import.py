@@ -0,0 +1,211 @@
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from prosdib import search
+from prosdib.export import NOTE_FIELDS
+from prosdib.models import History, Project, ProjectNote, Subscription, Technician, split_emails
+from prosdib.pagination import invalidate_counts
+from prosdib.registry import status_registry
+
+
+def parse_when(value):
+    if not value:
+        return None
+    when = parse_datetime(value)
+    if when is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'"{value}" is not a date')
+        when = datetime(date.year, date.month, date.day)
+    if settings.USE_TZ and timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+
+def read_csv_records(path):
+    """Yield (first line, last line, project dict) from a CSV file like the one made by the project export
+
+    Consecutive rows with the same id are one project, with one note per row in the note_ columns
+    """
+    with open(path, newline='') as csv_file:
+        reader = csv.DictReader(csv_file)
+        record = None
+        record_line = None
+        # reading the field names consumes the header
+        last_line = reader.line_num if reader.fieldnames else 0
+        for row in reader:
+            if record is None or not row.get('id') or row.get('id') != record.get('id'):
+                if record is not None:
+                    yield record_line, last_line, record
+                record = {key: value for key, value in row.items() if not key.startswith('note_')}
+                record['notes'] = []
+                record_line = last_line + 1
+            # line_num is the last line read, which is later than the start of the row if a value spans lines
+            last_line = reader.line_num
+
+            note = {field_name: row.get(f'note_{field_name}') for field_name in NOTE_FIELDS}
+            if note.get('maintext') or note.get('details'):
+                record['notes'].append(note)
+
+        if record is not None:
+            yield record_line, last_line, record
+
+
+def read_jsonl_records(path):
+    with open(path) as jsonl_file:
+        for line, text in enumerate(jsonl_file, start=1):
+            if text.strip():
+                yield line, line, json.loads(text)
+
+
+class Command(BaseCommand):
+    help = 'Import projects and their notes from a CSV or JSON Lines file in the format made by the project export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='The file format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='The number of projects written per transaction')
+        parser.add_argument('--resume-from-line', type=int, default=0, help='Skip the projects which start before this line.  Use the line reported after the last imported batch')
+        parser.add_argument('--user', help='The username recorded in the history of the imported projects')
+        parser.add_argument('--dry-run', action='store_true', help='Read and write everything, then roll it back')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+        records = read_jsonl_records(options['path']) if file_format == 'jsonl' else read_csv_records(options['path'])
+
+        self.user = None
+        if options['user']:
+            try:
+                self.user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'There is no user "{options["user"]}"')
+
+        # technicians and statuses are resolved once, by name; where names repeat the oldest technician is used
+        self.technicians = {technician.name: technician for technician in Technician.objects.order_by('-pk')}
+        self.statuses = {status.name: status for status in status_registry.get_statuses()}
+        self.default_status = status_registry.get_default_status()
+        self.path = options['path']
+        self.counts = {'projects': 0, 'notes': 0, 'unknown statuses': 0}
+
+        if options['dry_run']:
+            with transaction.atomic():
+                self.import_records(records, options)
+                transaction.set_rollback(True)
+            self.stdout.write(self.style.WARNING('Dry run, nothing was saved'))
+        else:
+            self.import_records(records, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.counts['projects']} projects and {self.counts['notes']} notes imported, "
+            f"{self.counts['unknown statuses']} with unknown statuses given the default status"
+        ))
+
+    def import_records(self, records, options):
+        batch = []
+        for line, last_line, record in records:
+            if line < options['resume_from_line']:
+                continue
+            batch.append((line, record))
+            if len(batch) >= options['batch_size']:
+                self.import_batch(batch, last_line)
+                batch = []
+        if batch:
+            self.import_batch(batch, last_line)
+
+    def get_technician(self, name):
+        if not name:
+            return None
+        if name not in self.technicians:
+            self.technicians[name] = Technician.objects.create(name=name, is_current=False)
+        return self.technicians[name]
+
+    def get_status(self, name):
+        if not name:
+            return self.default_status
+        if name not in self.statuses:
+            self.counts['unknown statuses'] = self.counts['unknown statuses'] + 1
+            return self.default_status
+        return self.statuses[name]
+
+    def make_project(self, line, record):
+        try:
+            return Project(
+                title=record['title'],
+                description=record.get('description') or '',
+                priority=int(record.get('priority') or 4),
+                begin=parse_when(record.get('begin')) or timezone.now(),
+                technician=self.get_technician(record.get('technician')),
+                created_by=self.get_technician(record.get('created_by')),
+                status=self.get_status(record.get('status')),
+            )
+        except (KeyError, ValueError) as e:
+            raise CommandError(f'{self.path} line {line}: {e}')
+
+    def make_note(self, line, project, note):
+        try:
+            return ProjectNote(
+                project=project,
+                maintext=note.get('maintext') or '',
+                details=note.get('details') or '',
+                when=parse_when(note.get('when')) or timezone.now(),
+                time_spent=Decimal(str(note.get('time_spent') or 0)),
+                is_current=parse_bool(note.get('is_current') or False),
+                submitted_by=self.get_technician(note.get('submitted_by')),
+            )
+        except (ValueError, ArithmeticError) as e:
+            raise CommandError(f'{self.path} line {line}: {e}')
+
+    def import_batch(self, batch, last_line):
+        with transaction.atomic():
+            projects = Project.objects.bulk_create([self.make_project(line, record) for line, record in batch])
+            if any(project.pk is None for project in projects):
+                raise CommandError('This database does not return the ids of bulk created rows, which the import needs')
+
+            notes = ProjectNote.objects.bulk_create([
+                self.make_note(line, project, note)
+                for (line, record), project in zip(batch, projects)
+                for note in record.get('notes') or []
+            ])
+
+            Subscription.objects.subscribe_many([
+                (project, email)
+                for (line, record), project in zip(batch, projects)
+                for email in split_emails(record.get('recipient_emails') or '')
+            ])
+
+            History.objects.bulk_create([
+                History(
+                    user=self.user,
+                    modelname='Project',
+                    objectid=project.pk,
+                    fieldname='imported',
+                    new_value=f'{self.path} line {line}',
+                )
+                for (line, record), project in zip(batch, projects)
+            ])
+
+            search.index_many(projects, notes)
+
+            # the rollups are committed with their batch, so a resumed import leaves none missing
+            Project.objects.update_rollups(pks=[project.pk for project in projects])
+
+        invalidate_counts()
+
+        self.counts['projects'] = self.counts['projects'] + len(projects)
+        self.counts['notes'] = self.counts['notes'] + len(notes)
+        self.stdout.write(f'Imported through line {last_line}, resume with --resume-from-line {last_line + 1}')
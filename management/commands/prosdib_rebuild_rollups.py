@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from prosdib.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored rollup fields (latest update, current notes, time spent) of every project'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='The number of projects updated per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pks = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+
+        updated = 0
+        for start in range(0, len(pks), batch_size):
+            updated = updated + Project.objects.update_rollups(pks=pks[start:start + batch_size])
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{updated} of {len(pks)} projects updated')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {updated} projects'))
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from prosdib.mail import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Queue one digest email per recipient for the projects changed since their last digest (used when PROSDIB_MAIL_DIGEST is set)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, sending digests every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='The number of seconds between digests when running with --loop (default: PROSDIB_DIGEST_INTERVAL or 3600)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval is None:
+            interval = getattr(settings, 'PROSDIB_DIGEST_INTERVAL', 3600)
+
+        while True:
+            queued = send_digests()
+            if queued or options['verbosity'] > 1:
+                self.stdout.write(f'{queued} digests queued')
+
+            if not options['loop']:
+                break
+
+            time.sleep(interval)
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from prosdib.mail import send_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send the queued project emails in batches over a single mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='The number of emails sent per connection',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=None,
+            help='The number of failures after which an email is no longer retried (default: PROSDIB_OUTBOX_MAX_ATTEMPTS or 5)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, checking the outbox every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30,
+            help='The number of seconds to wait between checks when running with --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = 0
+            total_failed = 0
+            while True:
+                sent, failed = send_outbox(
+                    batch_size=options['batch_size'],
+                    max_attempts=options['max_attempts'],
+                )
+                total_sent = total_sent + sent
+                total_failed = total_failed + failed
+                if sent + failed < options['batch_size']:
+                    break
+
+            if total_sent or total_failed or options['verbosity'] > 1:
+                self.stdout.write(f'{total_sent} emails sent, {total_failed} failed')
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
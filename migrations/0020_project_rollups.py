@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def forwards_func(apps, schema_editor):
+    Project = apps.get_model("prosdib", "Project")
+    ProjectNote = apps.get_model("prosdib", "ProjectNote")
+    db_alias = schema_editor.connection.alias
+
+    notes = ProjectNote.objects.using(db_alias).filter(project=OuterRef('pk')).order_by()
+    current_notes = notes.filter(is_current=True)
+    latest_current_notes = current_notes.order_by('-when')
+
+    Project.objects.using(db_alias).update(
+        latest_update_when=Subquery(latest_current_notes.values('when')[:1]),
+        latest_update_text=Coalesce(Subquery(latest_current_notes.values('maintext')[:1]), Value('')),
+        qty_current_notes=Coalesce(
+            Subquery(current_notes.values('project').annotate(qty=Count('pk')).values('qty'), output_field=models.IntegerField()),
+            Value(0),
+        ),
+        time_spent_total=Coalesce(
+            Subquery(notes.values('project').annotate(total=Sum('time_spent')).values('total'), output_field=models.DecimalField(max_digits=8, decimal_places=2)),
+            Value(0),
+            output_field=models.DecimalField(max_digits=8, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prosdib', '0019_alter_project_begin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='latest_update_when',
+            field=models.DateTimeField(blank=True, editable=False, help_text='The date of the most recent current note.  This is maintained automatically from the notes', null=True, verbose_name='latest update when'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='latest_update_text',
+            field=models.CharField(blank=True, editable=False, help_text='The text of the most recent current note.  This is maintained automatically from the notes', max_length=255, verbose_name='latest update text'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='qty_current_notes',
+            field=models.IntegerField(default=0, editable=False, help_text='The number of current notes.  This is maintained automatically from the notes', verbose_name='current notes'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='time_spent_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='The total time spent according to all notes.  This is maintained automatically from the notes', max_digits=8, verbose_name='total time spent'),
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prosdib', '0020_project_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(help_text='The subject of the email', max_length=255, verbose_name='subject')),
+                ('message', models.TextField(blank=True, help_text='The plain text body of the email', verbose_name='message')),
+                ('html_message', models.TextField(blank=True, help_text='The html body of the email', verbose_name='html message')),
+                ('from_email', models.CharField(help_text='The address from which the email is sent', max_length=254, verbose_name='from')),
+                ('recipients', models.TextField(help_text='The comma-separated list of addresses to which the email is sent', verbose_name='recipients')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Failed')], default='pending', help_text='If the email is waiting to be sent, has been sent, or has failed too many times to be retried', max_length=10, verbose_name='status')),
+                ('attempts', models.IntegerField(default=0, help_text='The number of failed attempts to send the email', verbose_name='attempts')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, help_text='The earliest time at which the email will be sent or retried', verbose_name='next attempt')),
+                ('last_error', models.TextField(blank=True, help_text='The error from the most recent failed attempt', verbose_name='last error')),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='The date and time the email was queued', verbose_name='created')),
+                ('sent', models.DateTimeField(blank=True, help_text='The date and time the email was sent', null=True, verbose_name='sent')),
+                ('project', models.ForeignKey(blank=True, help_text='The project about which this email is being sent', null=True, on_delete=django.db.models.deletion.SET_NULL, to='prosdib.project', verbose_name='project')),
+            ],
+            options={
+                'ordering': ('next_attempt',),
+                'indexes': [models.Index(fields=['status', 'next_attempt'], name='prosdib_outbox_due_idx')],
+            },
+        ),
+    ]
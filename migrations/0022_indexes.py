@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prosdib', '0021_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['status', 'priority'], name='prosdib_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['latest_update_when', 'priority'], name='prosdib_project_update_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectnote',
+            index=models.Index(fields=['project', 'is_current', '-when'], name='prosdib_note_current_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['modelname', 'objectid', '-when'], name='prosdib_history_object_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE prosdib_search USING fts5("
+                "project_id UNINDEXED, note_id UNINDEXED, title, body, tokenize='porter unicode61')"
+            )
+        except OperationalError:
+            # this sqlite was built without fts5, so search falls back to LIKE queries
+            return
+        key_column = 'rowid'
+
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE prosdib_search ("
+            "id bigint PRIMARY KEY, "
+            "project_id bigint NOT NULL, "
+            "note_id bigint NULL, "
+            "title text NOT NULL DEFAULT '', "
+            "body text NOT NULL DEFAULT '', "
+            "document tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')"
+            ") STORED)"
+        )
+        schema_editor.execute("CREATE INDEX prosdib_search_document_idx ON prosdib_search USING GIN (document)")
+        schema_editor.execute("CREATE INDEX prosdib_search_project_idx ON prosdib_search (project_id)")
+        key_column = 'id'
+
+    else:
+        return
+
+    schema_editor.execute(
+        f"INSERT INTO prosdib_search ({key_column}, project_id, note_id, title, body) "
+        "SELECT -id, id, NULL, title, description FROM prosdib_project"
+    )
+    schema_editor.execute(
+        f"INSERT INTO prosdib_search ({key_column}, project_id, note_id, title, body) "
+        "SELECT id, project_id, id, maintext, details FROM prosdib_projectnote"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS prosdib_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prosdib', '0022_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
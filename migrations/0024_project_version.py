@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prosdib', '0023_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incremented whenever the project, its notes, its status or its technician change.  Used to key cached renderings', verbose_name='version'),
+        ),
+    ]
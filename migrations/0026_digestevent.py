@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prosdib', '0025_project_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(help_text='The address of the recipient whose next digest will include this change', max_length=254, verbose_name='email')),
+                ('project_url', models.CharField(blank=True, help_text='The address of the project detail page, as seen by the user who made the change', max_length=255, verbose_name='project url')),
+                ('is_new', models.BooleanField(default=False, help_text='If the change was the submission of a new project', verbose_name='new')),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='The date and time of the change', verbose_name='created')),
+                ('project', models.ForeignKey(help_text='The project which was submitted or updated', on_delete=django.db.models.deletion.CASCADE, to='prosdib.project', verbose_name='project')),
+            ],
+            options={
+                'ordering': ('email', 'created'),
+                'indexes': [models.Index(fields=['created'], name='prosdib_digest_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_recipient_emails(apps, schema_editor):
+    Project = apps.get_model('prosdib', 'Project')
+    Subscription = apps.get_model('prosdib', 'Subscription')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    users = {}
+    for user in User.objects.exclude(email='').order_by('-pk'):
+        users[user.email] = user.pk
+
+    subscriptions = []
+    for project_pk, recipient_emails in Project.objects.exclude(recipient_emails='').values_list('pk', 'recipient_emails').iterator():
+        emails = []
+        for email in re.split(r'[\s,;]+', recipient_emails):
+            if '@' in email:
+                local, domain = email.rsplit('@', 1)
+                email = f'{local}@{domain.lower()}'
+                if email not in emails:
+                    emails.append(email)
+
+        subscriptions += [Subscription(project_id=project_pk, email=email, user_id=users.get(email)) for email in emails]
+        if len(subscriptions) >= 1000:
+            Subscription.objects.bulk_create(subscriptions, ignore_conflicts=True)
+            subscriptions = []
+
+    Subscription.objects.bulk_create(subscriptions, ignore_conflicts=True)
+
+
+def copy_subscriptions(apps, schema_editor):
+    Project = apps.get_model('prosdib', 'Project')
+    Subscription = apps.get_model('prosdib', 'Subscription')
+
+    emails = {}
+    for project_pk, email in Subscription.objects.order_by('project_id', 'email').values_list('project_id', 'email').iterator():
+        emails.setdefault(project_pk, []).append(email)
+
+    for project_pk, project_emails in emails.items():
+        Project.objects.filter(pk=project_pk).update(recipient_emails=',\n'.join(project_emails))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prosdib', '0026_digestevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(help_text='The address to which emails about the project are sent', max_length=254, verbose_name='email')),
+                ('project', models.ForeignKey(help_text='The project about which emails are sent', on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='prosdib.project', verbose_name='project')),
+                ('user', models.ForeignKey(blank=True, help_text='The user with this email, if there was one when the subscription was made', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prosdib_subscriptions', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'ordering': ('email',),
+                'indexes': [models.Index(fields=['email'], name='prosdib_subscription_email_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'email'), name='prosdib_subscription_unique')],
+            },
+        ),
+        migrations.RunPython(copy_recipient_emails, copy_subscriptions),
+        migrations.RemoveField(
+            model_name='project',
+            name='recipient_emails',
+        ),
+    ]
@@ -1,15 +1,22 @@
+import copy
+import re
 from django.db import models
 from django.conf import settings
 from datetime import datetime
 from django.apps import apps
 from libtekin.models import Item, Location
 from django.contrib.auth import get_user_model
-from django.db.models import Count, OuterRef, Q, Subquery
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 def get_default_status():
+    from .registry import status_registry
+
     try:
-        return Status.objects.filter(is_default=True).first().pk
+        return status_registry.get_default_status().pk
     except AttributeError:
         return None
 
@@ -70,16 +77,105 @@ class Technician(models.Model):
 
     @classmethod
     def user_is_tech(cls, user):
-        return user in [ technician.user for technician in Technician.objects.all() ]
+        return user.pk is not None and cls.objects.filter(user=user).exists()
+
+def get_rollup_expressions():
+    """Return the expressions used to recalculate the stored rollup fields of Project
+
+    The expressions are correlated subqueries on the project note table, so they can be passed
+    directly to QuerySet.update() to refresh one project or a whole batch in a single query
+    """
+    notes = ProjectNote.objects.filter(project=OuterRef('pk')).order_by()
+    current_notes = notes.filter(is_current=True)
+    latest_current_notes = current_notes.order_by('-when')
+
+    return {
+        'latest_update_when': Subquery(latest_current_notes.values('when')[:1]),
+        'latest_update_text': Coalesce(Subquery(latest_current_notes.values('maintext')[:1]), Value('')),
+        'qty_current_notes': Coalesce(
+            Subquery(current_notes.values('project').annotate(qty=Count('pk')).values('qty'), output_field=IntegerField()),
+            Value(0),
+        ),
+        'time_spent_total': Coalesce(
+            Subquery(notes.values('project').annotate(total=Sum('time_spent')).values('total'), output_field=DecimalField(max_digits=8, decimal_places=2)),
+            Value(0),
+            output_field=DecimalField(max_digits=8, decimal_places=2),
+        ),
+    }
+
+def get_current_notes_prefetch():
+    """Return a Prefetch of the current notes of projects, stored in prefetched_current_notes"""
+    return Prefetch(
+        'projectnote_set',
+        queryset=ProjectNote.objects.filter(is_current=True),
+        to_attr='prefetched_current_notes',
+    )
 
-class ProjectManager(models.Manager):
+def rewrite_status_lookups(args, kwargs):
+    """Replace status__is_active lookups with status_id__in lookups on the ids from the status registry
 
-    def get_queryset(self):
-        
-        return super().get_queryset(). \
-            annotate(latest_update_when=Subquery(ProjectNote.objects.filter(project=OuterRef('pk')).filter(is_current=True).order_by('-when').values('when')[:1])). \
-            annotate(qty_current_notes=Count('projectnote', filter=Q(projectnote__is_current=True))). \
-            order_by('latest_update_when')
+    This avoids joining the status table for the most common project list filter.  The ids are those of the
+    registry when the filter is built, so this is only used for querysets built per request (see ProjectList)
+    """
+    from .registry import status_registry
+
+    def rewrite(key, value):
+        if key not in ('status__is_active', 'status__is_active__exact'):
+            return key, value
+        try:
+            is_active = models.BooleanField().to_python(value)
+        except ValidationError:
+            return key, value
+        if is_active is None:
+            return key, value
+        return 'status_id__in', status_registry.get_active_status_ids(is_active)
+
+    def rewrite_q(q):
+        q = copy.copy(q)
+        q.children = [
+            rewrite_q(child) if isinstance(child, Q) else rewrite(*child)
+            for child in q.children
+        ]
+        return q
+
+    args = [rewrite_q(arg) if isinstance(arg, Q) else arg for arg in args]
+    kwargs = dict(rewrite(key, value) for key, value in kwargs.items())
+    return args, kwargs
+
+class ProjectQuerySet(models.QuerySet):
+
+    def with_activity(self, live=False):
+        """Order the projects by their latest current note, least recently updated first
+
+        The activity comes from the stored rollup fields.  With live=True it is also calculated from the notes
+        as live_latest_update_when and live_qty_current_notes, which is much slower but useful for checking
+        the stored values
+        """
+        queryset = self
+        if live:
+            queryset = queryset.annotate(
+                live_latest_update_when=Subquery(ProjectNote.objects.filter(project=OuterRef('pk')).filter(is_current=True).order_by('-when').values('when')[:1]),
+                live_qty_current_notes=Count('projectnote', filter=Q(projectnote__is_current=True)),
+            )
+
+        return queryset.order_by('latest_update_when')
+
+class ProjectManager(models.Manager.from_queryset(ProjectQuerySet)):
+
+    def update_rollups(self, pks=None):
+        """Recalculate the stored rollup fields for the projects with the given pks, or for all projects
+
+        The version of each project is also incremented, since its notes have changed
+        """
+        projects = self.get_queryset()
+        if pks is not None:
+            projects = projects.filter(pk__in=pks)
+
+        return projects.update(version=F('version') + 1, updated_at=timezone.now(), **get_rollup_expressions())
+
+    def bump_versions(self, *args, **filters):
+        """Increment the version and updated_at of the projects matching the filters, so cached renderings of them are replaced"""
+        return self.get_queryset().filter(*args, **filters).update(version=F('version') + 1, updated_at=timezone.now())
 
 class Project(models.Model):
     PRIORITY_CHOICES = (
@@ -135,10 +231,45 @@ class Project(models.Model):
         default = get_default_status,
         help_text = 'The status of this project'
     )
-    recipient_emails = models.TextField(
-        'recipient emails',
+    latest_update_when = models.DateTimeField(
+        'latest update when',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='The date of the most recent current note.  This is maintained automatically from the notes'
+    )
+    latest_update_text = models.CharField(
+        'latest update text',
+        max_length=255,
         blank=True,
-        help_text='The comma-separated list of emails of those who should get updates on this project.  By default, emails are sent for changes in notes and resolution status'
+        editable=False,
+        help_text='The text of the most recent current note.  This is maintained automatically from the notes'
+    )
+    qty_current_notes = models.IntegerField(
+        'current notes',
+        default=0,
+        editable=False,
+        help_text='The number of current notes.  This is maintained automatically from the notes'
+    )
+    time_spent_total = models.DecimalField(
+        'total time spent',
+        default=0,
+        decimal_places=2,
+        max_digits=8,
+        editable=False,
+        help_text='The total time spent according to all notes.  This is maintained automatically from the notes'
+    )
+    version = models.PositiveIntegerField(
+        'version',
+        default=0,
+        editable=False,
+        help_text='Incremented whenever the project, its notes, its status or its technician change.  Used to key cached renderings'
+    )
+    updated_at = models.DateTimeField(
+        'updated at',
+        auto_now=True,
+        db_index=True,
+        help_text='The date and time the project, its notes, its status or its technicians last changed'
     )
 
     def __str__(self):
@@ -150,22 +281,37 @@ class Project(models.Model):
     def get_current_notes(self):
         current_notes=[]
 
-        for note in self.projectnote_set.filter(is_current=True):
+        # use the notes prefetched by ProjectList (see get_current_notes_prefetch) if they are present
+        if hasattr(self, 'prefetched_current_notes'):
+            notes = self.prefetched_current_notes
+        else:
+            notes = self.projectnote_set.filter(is_current=True)
+
+        for note in notes:
             current_notes.append('{}: {}'.format(note.when.strftime('%Y-%m-%d'), note.maintext))
 
         return current_notes
 
+    def get_recipient_emails(self):
+        """Return the emails subscribed to this project, from subscriptions prefetched with prefetch_related('subscriptions') if present"""
+        return [subscription.email for subscription in self.subscriptions.all()]
+
     def get_time_spent(self):
-        time_spent = 0
-        for note in self.projectnote_set.filter(time_spent__gt=0):
-            time_spent = time_spent + note.time_spent
+        # time_spent_total is kept up to date from the notes, so no query is needed
+        return self.time_spent_total
 
-        return time_spent
+    def update_rollups(self):
+        Project.objects.update_rollups(pks=[self.pk])
 
     objects = ProjectManager()
 
     class Meta:
-        ordering=['status', 'priority']
+        # status_id rather than status, since ordering by status would join the status table for its own ordering
+        ordering=['status_id', 'priority']
+        indexes = [
+            models.Index(fields=['status', 'priority'], name='prosdib_project_status_idx'),
+            models.Index(fields=['latest_update_when', 'priority'], name='prosdib_project_update_idx'),
+        ]
 
 
 class ProjectNote(models.Model):
@@ -213,10 +359,48 @@ class ProjectNote(models.Model):
 
     class Meta:
         ordering = ['-when',]
+        indexes = [
+            models.Index(fields=['project', 'is_current', '-when'], name='prosdib_note_current_idx'),
+        ]
 
     def __str__(self):
         return f'{self.when.date().isoformat()}: {self.maintext}' if self.when else self.maintext
 
+def resolve_history_objects(histories):
+    """Load the objects referred to by the given History rows with one in_bulk query per model
+
+    Each row gets the object (or None if it no longer exists) in _resolved_object, which is used by History.__str__
+    """
+    histories = list(histories)
+
+    objectids = {}
+    for history in histories:
+        if history.objectid is not None:
+            objectids.setdefault(history.modelname, set()).add(history.objectid)
+
+    objects = {}
+    for modelname, ids in objectids.items():
+        try:
+            model = apps.get_model('prosdib', modelname)
+        except LookupError:
+            continue
+        objects[modelname] = model._default_manager.in_bulk(ids)
+
+    for history in histories:
+        history._resolved_object = objects.get(history.modelname, {}).get(history.objectid)
+
+    return histories
+
+class HistoryQuerySet(models.QuerySet):
+
+    def for_object(self, modelname, objectid):
+        return self.filter(modelname=modelname, objectid=objectid)
+
+    def resolve_objects(self):
+        """Evaluate the queryset and load the objects its rows refer to, grouped by model"""
+        resolve_history_objects(self)
+        return self
+
 class History(models.Model):
 
     when = models.DateTimeField(
@@ -259,21 +443,266 @@ class History(models.Model):
         help_text='The user who made this change'
     )
 
+    objects = HistoryQuerySet.as_manager()
+
     class Meta:
         ordering = ('-when', 'modelname', 'objectid')
+        indexes = [
+            models.Index(fields=['modelname', 'objectid', '-when'], name='prosdib_history_object_idx'),
+        ]
+
+    def get_object(self):
+        """Return the changed object, using the one loaded by HistoryQuerySet.resolve_objects if there is one"""
+        if not hasattr(self, '_resolved_object'):
+            resolve_history_objects([self])
+
+        return self._resolved_object
 
     def __str__(self):
 
         new_value_trunc = self.new_value[:17:]+'...' if len(self.new_value) > 20 else self.new_value
 
-        try:
-            model = apps.get_model('prosdib', self.modelname)
-            object = model.objects.get(pk=self.objectid)
+        object = self.get_object()
+        if object is not None:
             return f'{self.when.strftime("%Y-%m-%d")}: {self.modelname}: [{object}] [{self.fieldname}] changed to "{new_value_trunc}"'
 
-        except Exception as e:
-            print (e)
+        return f'{self.when.strftime("%Y-%m-%d")}: {self.modelname}: {self.objectid} [{self.fieldname}] changed to "{new_value_trunc}"'
 
-        return f'{"mdy".format(self.when.strftime("%Y-%m-%d"))}: {self.modelname}: {self.objectid} [{self.fieldname}] changed to "{new_value_trunc}"'
 
 
+class OutboxMessage(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Failed'),
+    )
+
+    project = models.ForeignKey(
+        Project,
+        verbose_name='project',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        help_text='The project about which this email is being sent'
+    )
+    subject = models.CharField(
+        'subject',
+        max_length=255,
+        help_text='The subject of the email'
+    )
+    message = models.TextField(
+        'message',
+        blank=True,
+        help_text='The plain text body of the email'
+    )
+    html_message = models.TextField(
+        'html message',
+        blank=True,
+        help_text='The html body of the email'
+    )
+    from_email = models.CharField(
+        'from',
+        max_length=254,
+        help_text='The address from which the email is sent'
+    )
+    recipients = models.TextField(
+        'recipients',
+        help_text='The comma-separated list of addresses to which the email is sent'
+    )
+    status = models.CharField(
+        'status',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        help_text='If the email is waiting to be sent, has been sent, or has failed too many times to be retried'
+    )
+    attempts = models.IntegerField(
+        'attempts',
+        default=0,
+        help_text='The number of failed attempts to send the email'
+    )
+    next_attempt = models.DateTimeField(
+        'next attempt',
+        default=timezone.now,
+        help_text='The earliest time at which the email will be sent or retried'
+    )
+    last_error = models.TextField(
+        'last error',
+        blank=True,
+        help_text='The error from the most recent failed attempt'
+    )
+    created = models.DateTimeField(
+        'created',
+        auto_now_add=True,
+        help_text='The date and time the email was queued'
+    )
+    sent = models.DateTimeField(
+        'sent',
+        null=True,
+        blank=True,
+        help_text='The date and time the email was sent'
+    )
+
+    class Meta:
+        ordering = ('next_attempt',)
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'], name='prosdib_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.created.strftime("%Y-%m-%d") if self.created else ""}: {self.subject} ({self.get_status_display()})'
+
+    def get_recipients(self):
+        return [email.strip() for email in self.recipients.split(',') if email.strip()]
+
+
+class DigestEvent(models.Model):
+    project = models.ForeignKey(
+        Project,
+        verbose_name='project',
+        on_delete=models.CASCADE,
+        help_text='The project which was submitted or updated'
+    )
+    email = models.CharField(
+        'email',
+        max_length=254,
+        help_text='The address of the recipient whose next digest will include this change'
+    )
+    project_url = models.CharField(
+        'project url',
+        max_length=255,
+        blank=True,
+        help_text='The address of the project detail page, as seen by the user who made the change'
+    )
+    is_new = models.BooleanField(
+        'new',
+        default=False,
+        help_text='If the change was the submission of a new project'
+    )
+    created = models.DateTimeField(
+        'created',
+        auto_now_add=True,
+        help_text='The date and time of the change'
+    )
+
+    class Meta:
+        ordering = ('email', 'created',)
+        indexes = [
+            models.Index(fields=['created'], name='prosdib_digest_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.email}: {self.project_id}'
+
+
+def split_emails(emails):
+    """Return the normalized, distinct addresses in a list of emails or a string of emails separated by commas, semicolons or whitespace"""
+    if isinstance(emails, str):
+        emails = re.split(r'[\s,;]+', emails)
+
+    normalized = [BaseUserManager.normalize_email(email.strip()) for email in emails if email and '@' in email]
+    return list(dict.fromkeys(normalized))
+
+
+class SubscriptionQuerySet(models.QuerySet):
+    # every change bumps the versions of the projects involved, so renderings cached per version are replaced
+
+    def subscribe_many(self, pairs):
+        """Create subscriptions for a list of (project or project pk, email) pairs, skipping those which exist
+
+        Subscriptions are linked to the users with matching emails, which are read in one query
+        """
+        pairs = [(getattr(project, 'pk', project), email) for project, email in pairs]
+        if not pairs:
+            return []
+
+        users = {}
+        for user in get_user_model().objects.filter(email__in={email for project_pk, email in pairs}).order_by('-pk'):
+            users[user.email] = user
+
+        subscriptions = self.bulk_create(
+            [Subscription(project_id=project_pk, email=email, user=users.get(email)) for project_pk, email in pairs],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        Project.objects.bump_versions(pk__in={project_pk for project_pk, email in pairs})
+
+        return subscriptions
+
+    def remove(self):
+        """Delete these subscriptions, returning the number deleted"""
+        project_pks = set(self.values_list('project_id', flat=True))
+        if not project_pks:
+            return 0
+
+        deleted, deleted_per_model = self.delete()
+        Project.objects.bump_versions(pk__in=project_pks)
+
+        return deleted
+
+    def subscribe(self, projects, emails):
+        """Subscribe each of the emails to each of the projects"""
+        emails = split_emails(emails)
+        return self.subscribe_many([(project, email) for project in projects for email in emails])
+
+    def unsubscribe(self, projects, emails):
+        """Remove the subscriptions of each of the emails to each of the projects"""
+        return self.filter(
+            project__in=[getattr(project, 'pk', project) for project in projects],
+            email__in=split_emails(emails),
+        ).remove()
+
+    def set_project_emails(self, project, emails):
+        """Make the subscriptions to a project match a list or comma-separated string of emails"""
+        emails = split_emails(emails)
+        self.filter(project=project).exclude(email__in=emails).remove()
+        return self.subscribe_many([(project, email) for email in emails])
+
+    def for_user(self, user):
+        """Filter to the subscriptions of a user, by account or by email"""
+        condition = Q(user=user)
+        if user.email:
+            condition = condition | Q(email=BaseUserManager.normalize_email(user.email))
+
+        return self.filter(condition)
+
+
+class Subscription(models.Model):
+    project = models.ForeignKey(
+        Project,
+        verbose_name='project',
+        on_delete=models.CASCADE,
+        related_name='subscriptions',
+        help_text='The project about which emails are sent'
+    )
+    email = models.CharField(
+        'email',
+        max_length=254,
+        help_text='The address to which emails about the project are sent'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='user',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='prosdib_subscriptions',
+        help_text='The user with this email, if there was one when the subscription was made'
+    )
+
+    objects = SubscriptionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('email',)
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'email'], name='prosdib_subscription_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['email'], name='prosdib_subscription_email_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.email}: {self.project_id}'
@@ -0,0 +1,183 @@
+import hashlib
+import math
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+CURSOR_SALT = "prosdib.pagination.cursor"
+COUNT_GENERATION_KEY = "prosdib:count-generation"
+
+
+def get_count_timeout():
+    return getattr(settings, "PROSDIB_COUNT_CACHE_TIMEOUT", 60)
+
+
+def cached_count(queryset, key, timeout=None):
+    """Return the number of rows in queryset, cached under key for timeout seconds
+
+    The count is made without the ordering, related selects and prefetches of the queryset
+    """
+    if timeout is None:
+        timeout = get_count_timeout()
+    return cache.get_or_set(key, queryset.order_by().select_related(None).prefetch_related(None).count, timeout)
+
+
+def invalidate_counts():
+    """Make every cached count stale, after projects are created, changed or deleted"""
+    cache.set(COUNT_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def make_cache_key(prefix, querydict):
+    """Make a cache key from a prefix and a QueryDict, independent of the order of its keys
+
+    The key changes whenever invalidate_counts is called
+    """
+    normalized = "&".join(
+        f"{key}={','.join(sorted(querydict.getlist(key)))}" for key in sorted(querydict.keys())
+    )
+    generation = cache.get(COUNT_GENERATION_KEY, "")
+    return f"{prefix}:{generation}:{hashlib.md5(normalized.encode()).hexdigest()}"
+
+
+class CachedCountPaginator(Paginator):
+    """A Paginator which caches its count under count_cache_key"""
+
+    def __init__(self, object_list, per_page, count_cache_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_cache_key = count_cache_key
+
+    @cached_property
+    def count(self):
+        if self.count_cache_key is None:
+            return super().count
+        return cached_count(self.object_list, self.count_cache_key)
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Keyset page of {len(self.object_list)}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset by the values of the last row of a page instead of by offset
+
+    The queryset is ordered by the given fields, all ascending with nulls first.  The last field must be unique,
+    usually pk.  Pages are requested with opaque, signed cursors, so fetching a deep page costs the same as
+    fetching the first.  The count is only used for display and is cached under count_cache_key if one is given
+    """
+
+    def __init__(self, queryset, per_page, ordering, count_cache_key=None, count_timeout=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        self.count_cache_key = count_cache_key
+        self.count_timeout = count_timeout
+
+    @property
+    def count(self):
+        if self.count_cache_key is None:
+            return self.queryset.count()
+        return cached_count(self.queryset, self.count_cache_key, self.count_timeout)
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def encode_cursor(self, direction, obj):
+        values = [getattr(obj, name) for name in self.ordering]
+        values = [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+        return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None, None
+
+        model = self.queryset.model
+        fields = [
+            model._meta.pk if name == "pk" else model._meta.get_field(name)
+            for name in self.ordering
+        ]
+        if direction not in ("next", "previous") or len(values) != len(fields):
+            return None, None
+
+        return direction, [
+            None if value is None else field.to_python(value)
+            for field, value in zip(fields, values)
+        ]
+
+    def get_keyset_condition(self, values, direction):
+        def beyond(name, value):
+            if direction == "next":
+                return Q(**{f"{name}__isnull": False}) if value is None else Q(**{f"{name}__gt": value})
+            if value is None:
+                return Q(pk__in=[])
+            return Q(**{f"{name}__lt": value}) | Q(**{f"{name}__isnull": True})
+
+        def equal(name, value):
+            if value is None:
+                return Q(**{f"{name}__isnull": True})
+            return Q(**{name: value})
+
+        pairs = list(zip(self.ordering, values))
+        condition = beyond(*pairs[-1])
+        for name, value in reversed(pairs[:-1]):
+            condition = beyond(name, value) | (equal(name, value) & condition)
+
+        return condition
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else (None, None)
+
+        if direction == "previous":
+            ordering = [F(name).desc(nulls_last=True) for name in self.ordering]
+        else:
+            ordering = [F(name).asc(nulls_first=True) for name in self.ordering]
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_condition(values, direction))
+
+        object_list = list(queryset[: self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[: self.per_page]
+
+        if direction == "previous":
+            object_list.reverse()
+            has_next = True
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = values is not None
+
+        next_cursor = self.encode_cursor("next", object_list[-1]) if has_next and object_list else None
+        previous_cursor = self.encode_cursor("previous", object_list[0]) if has_previous and object_list else None
+
+        return KeysetPage(object_list, self, next_cursor, previous_cursor)
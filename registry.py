@@ -0,0 +1,129 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+# how long a thread trusts the version it last read from the cache, unless a new request starts
+VERSION_CHECK_SECONDS = 1
+
+
+def get_timeout():
+    return getattr(settings, "PROSDIB_STATUS_REGISTRY_TIMEOUT", 300)
+
+
+class StatusRegistry:
+    """An in-process cache of all statuses
+
+    The statuses are loaded once and reloaded after a Status is saved or deleted (see signals.py).  Other
+    processes notice the change through a version key in the default cache, which each thread reads once per
+    request (see signals.py) and at most once every VERSION_CHECK_SECONDS outside of requests.  The statuses are
+    also reloaded every PROSDIB_STATUS_REGISTRY_TIMEOUT seconds, in case the default cache is not shared.
+    Statuses loaded inside a transaction are reloaded once that transaction or savepoint ends, so a rollback
+    cannot leave stale statuses
+    """
+
+    version_key = "prosdib:status-registry-version"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._statuses = None
+        self._version = None
+        self._transaction_state = None
+        self._loaded_at = None
+        self._local = threading.local()
+
+    def invalidate(self):
+        """Reload the statuses in this process now, and in other processes once the change is committed"""
+        self.clear()
+        # other processes must not read the new version before they can read the new statuses
+        transaction.on_commit(self.set_version, using=self.get_connection().alias)
+
+    def set_version(self):
+        cache.set(self.version_key, uuid.uuid4().hex, get_timeout())
+
+    def reset_version_check(self):
+        """Make the next lookup in this thread read the version from the cache again"""
+        self._local.checked_at = None
+
+    def get_version(self):
+        checked_at = getattr(self._local, "checked_at", None)
+        if checked_at is None or time.monotonic() - checked_at > VERSION_CHECK_SECONDS:
+            self._local.version = cache.get(self.version_key)
+            self._local.checked_at = time.monotonic()
+
+        return self._local.version
+
+    def get_connection(self):
+        from .models import Status
+
+        return connections[router.db_for_read(Status)]
+
+    def get_transaction_state(self):
+        connection = self.get_connection()
+        return list(getattr(connection, "atomic_blocks", [])), list(connection.savepoint_ids)
+
+    def is_current(self, version):
+        if self._statuses is None or version != self._version:
+            return False
+        if time.monotonic() - self._loaded_at > get_timeout():
+            return False
+
+        # the statuses must have been loaded in the current transaction or in an enclosing one
+        atomic_blocks, savepoint_ids = self.get_transaction_state()
+        loaded_atomic_blocks, loaded_savepoint_ids = self._transaction_state
+        return (
+            len(loaded_atomic_blocks) <= len(atomic_blocks)
+            and all(loaded is current for loaded, current in zip(loaded_atomic_blocks, atomic_blocks))
+            and loaded_savepoint_ids == savepoint_ids[: len(loaded_savepoint_ids)]
+        )
+
+    def get_statuses(self):
+        """Return all statuses in display order"""
+        from .models import Status
+
+        version = self.get_version()
+        if not self.is_current(version):
+            with self._lock:
+                self._statuses = list(Status.objects.order_by("list_position", "name"))
+                self._version = version
+                self._transaction_state = self.get_transaction_state()
+                self._loaded_at = time.monotonic()
+
+        return self._statuses
+
+    def get(self, pk):
+        for status in self.get_statuses():
+            if status.pk == pk:
+                return status
+        return None
+
+    def get_default_status(self):
+        for status in self.get_statuses():
+            if status.is_default:
+                return status
+        return None
+
+    def get_active_status_ids(self, is_active=True):
+        return [status.pk for status in self.get_statuses() if status.is_active == is_active]
+
+    def get_display_order(self):
+        """Return the status pks in display order"""
+        return [status.pk for status in self.get_statuses()]
+
+    def get_order_expression(self, field_name="status_id"):
+        """Return an expression of the display position of a status foreign key, for ordering without a join"""
+        return Case(
+            *[When(**{field_name: pk}, then=Value(position)) for position, pk in enumerate(self.get_display_order())],
+            default=Value(len(self.get_display_order())),
+            output_field=IntegerField(),
+        )
+
+
+status_registry = StatusRegistry()
@@ -0,0 +1,168 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import Project
+
+SEARCH_TABLE = "prosdib_search"
+
+# markers placed around matches by the database, replaced with <mark> after the snippet is escaped
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+_indexed_aliases = {}
+
+
+def get_search_connection():
+    return connections[router.db_for_write(Project)]
+
+
+def is_search_indexed(connection):
+    """Return True if the search table was created for this database (see migration 0023)"""
+    if connection.alias not in _indexed_aliases:
+        _indexed_aliases[connection.alias] = (
+            connection.vendor in ("sqlite", "postgresql")
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+
+    return _indexed_aliases[connection.alias]
+
+
+def get_key_column(connection):
+    return "rowid" if connection.vendor == "sqlite" else "id"
+
+
+def write_search_row(key, project_id, note_id, title, body):
+    connection = get_search_connection()
+    if not is_search_indexed(connection):
+        return
+
+    key_column = get_key_column(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {key_column} = %s", [key])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({key_column}, project_id, note_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+            [key, project_id, note_id, title or "", body or ""],
+        )
+
+
+def delete_search_row(key):
+    connection = get_search_connection()
+    if not is_search_indexed(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {get_key_column(connection)} = %s", [key])
+
+
+# projects are stored with negative keys so they never collide with the note ids
+def index_project(project):
+    write_search_row(-project.pk, project.pk, None, project.title, project.description)
+
+
+def remove_project(project):
+    delete_search_row(-project.pk)
+
+
+def index_note(note):
+    write_search_row(note.pk, note.project_id, note.pk, note.maintext, note.details)
+
+
+def remove_note(note):
+    delete_search_row(note.pk)
+
+
+def index_many(projects=(), notes=()):
+    """Add projects and notes to the search index in bulk, for rows written without signals such as by bulk_create"""
+    connection = get_search_connection()
+    if not is_search_indexed(connection):
+        return
+
+    rows = [(-project.pk, project.pk, None, project.title or "", project.description or "") for project in projects]
+    rows += [(note.pk, note.project_id, note.pk, note.maintext or "", note.details or "") for note in notes]
+    if not rows:
+        return
+
+    key_column = get_key_column(connection)
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE {key_column} = %s", [[row[0]] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} ({key_column}, project_id, note_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def highlight(snippet):
+    return (
+        escape(snippet or "")
+        .replace(HIGHLIGHT_START, "<mark>")
+        .replace(HIGHLIGHT_STOP, "</mark>")
+    )
+
+
+def search_rows(connection, query, limit):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            terms = re.findall(r"\w+", query)
+            if not terms:
+                return []
+            cursor.execute(
+                f"SELECT project_id, note_id, bm25({SEARCH_TABLE}, 0.0, 0.0, 10.0, 1.0) AS rank, "
+                f"snippet({SEARCH_TABLE}, -1, %s, %s, '...', 16) "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+                [HIGHLIGHT_START, HIGHLIGHT_STOP, " ".join(f'"{term}"*' for term in terms), limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT project_id, note_id, -ts_rank(document, query) AS rank, "
+                f"ts_headline('english', title || ' ' || body, query, %s) "
+                f"FROM {SEARCH_TABLE}, websearch_to_tsquery('english', %s) query "
+                f"WHERE document @@ query ORDER BY rank LIMIT %s",
+                [f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30", query, limit],
+            )
+        return cursor.fetchall()
+
+
+def search_projects(query, limit=50, max_snippets=3):
+    """Search the titles and descriptions of projects and the text and details of their notes
+
+    Returns:
+        A list of dicts with the project, its rank (lower is better) and up to max_snippets highlighted
+        note snippets (html), best match first
+    """
+    connection = get_search_connection()
+    query = query.strip()
+    if not query:
+        return []
+
+    if not is_search_indexed(connection):
+        matches = (
+            Project.objects.filter(
+                Q(title__icontains=query)
+                | Q(description__icontains=query)
+                | Q(projectnote__maintext__icontains=query)
+                | Q(projectnote__details__icontains=query)
+            )
+            .select_related("technician", "status")
+            .distinct()[:limit]
+        )
+        return [{"project": project, "rank": 0, "snippets": []} for project in matches]
+
+    results = {}
+    for project_id, note_id, rank, snippet in search_rows(connection, query, limit * 10):
+        if project_id not in results:
+            if len(results) >= limit:
+                continue
+            results[project_id] = {"rank": rank, "snippets": []}
+        if note_id is not None and len(results[project_id]["snippets"]) < max_snippets:
+            results[project_id]["snippets"].append(highlight(snippet))
+
+    projects = Project.objects.select_related("technician", "status").in_bulk(results.keys())
+
+    return [
+        {"project": projects[project_id], **result}
+        for project_id, result in results.items()
+        if project_id in projects
+    ]
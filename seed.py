@@ -0,0 +1,127 @@
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import History, Project, ProjectNote, Status, Subscription, Technician
+
+
+def get_seed_statuses():
+    statuses = list(Status.objects.all())
+    if not statuses:
+        Status.objects.bulk_create(
+            [
+                Status(name="Open", list_position=10, is_default=True),
+                Status(name="Waiting", list_position=20),
+                Status(name="Closed", list_position=30, is_active=False),
+            ]
+        )
+        # read back, since bulk_create does not return primary keys on every backend
+        statuses = list(Status.objects.all())
+
+    return statuses
+
+
+def seed_data(
+    projects=1000,
+    notes_per_project=10,
+    technicians=10,
+    histories_per_project=0,
+    seed=0,
+    batch_size=1000,
+    now=None,
+):
+    """Create a reproducible set of technicians, projects, notes and history rows for benchmarks
+
+    The same seed and now always produce the same rows.  Rows are written with bulk_create, so the
+    project rollups are rebuilt once at the end
+
+    Returns:
+        A dict of the number of rows created per model
+    """
+    rng = random.Random(seed)
+    if now is None:
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc if settings.USE_TZ else None)
+    statuses = get_seed_statuses()
+
+    # bulk_create does not return primary keys on every backend, so the rows it makes are read back
+    # by their seed names before they are referred to
+    Technician.objects.bulk_create(
+        [Technician(name=f"Seed Technician {number}") for number in range(technicians)],
+        batch_size=batch_size,
+    )
+    created_technicians = list(
+        Technician.objects.filter(name__startswith="Seed Technician ").order_by("-pk")[:technicians]
+    )[::-1]
+
+    created_projects = Project.objects.bulk_create(
+        [
+            Project(
+                title=f"Seed Project {number}",
+                description=" ".join(
+                    rng.choice(["printer", "network", "laptop", "badge", "router", "kiosk"])
+                    for word in range(rng.randint(5, 40))
+                ),
+                priority=rng.randint(1, 5),
+                begin=now - timedelta(days=rng.randint(0, 1500)),
+                technician=rng.choice(created_technicians) if created_technicians else None,
+                created_by=rng.choice(created_technicians) if created_technicians else None,
+                status=rng.choice(statuses),
+            )
+            for number in range(projects)
+        ],
+        batch_size=batch_size,
+    )
+
+    project_pks = list(
+        Project.objects.filter(title__startswith="Seed Project ")
+        .order_by("-pk")
+        .values_list("pk", flat=True)[: len(created_projects)]
+    )
+
+    Subscription.objects.subscribe(project_pks, ["seed@example.com"])
+
+    notes = []
+    qty_notes = 0
+    for project_pk in project_pks:
+        for number in range(notes_per_project):
+            notes.append(
+                ProjectNote(
+                    project_id=project_pk,
+                    maintext=f"Seed note {number} for project {project_pk}",
+                    details="Checked the " + rng.choice(["cable", "driver", "account", "switch port", "toner"]),
+                    submitted_by=rng.choice(created_technicians) if created_technicians else None,
+                    when=now - timedelta(minutes=rng.randint(0, 2000000)),
+                    time_spent=Decimal(rng.randint(0, 16)) / 4,
+                    is_current=rng.random() < 0.3,
+                )
+            )
+        if len(notes) >= batch_size:
+            ProjectNote.objects.bulk_create(notes, batch_size=batch_size)
+            qty_notes = qty_notes + len(notes)
+            notes = []
+    ProjectNote.objects.bulk_create(notes, batch_size=batch_size)
+    qty_notes = qty_notes + len(notes)
+
+    histories = [
+        History(
+            modelname="Project",
+            objectid=project_pk,
+            fieldname=rng.choice(["title", "priority", "status", "technician"]),
+            old_value=str(rng.randint(1, 5)),
+            new_value=str(rng.randint(1, 5)),
+        )
+        for project_pk in project_pks
+        for number in range(histories_per_project)
+    ]
+    History.objects.bulk_create(histories, batch_size=batch_size)
+
+    Project.objects.update_rollups(pks=project_pks)
+
+    return {
+        "technicians": len(created_technicians),
+        "projects": len(project_pks),
+        "notes": qty_notes,
+        "histories": len(histories),
+    }
@@ -0,0 +1,115 @@
+from django.db.models import Q
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search
+from .choices import technician_choices, user_choices
+from .models import Project, ProjectNote, Status, Technician
+from .pagination import invalidate_counts
+from .registry import status_registry
+from .technicians import invalidate_session_technicians
+
+
+@receiver(post_save, sender=ProjectNote)
+@receiver(post_delete, sender=ProjectNote)
+def update_project_rollups(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    Project.objects.update_rollups(pks=[instance.project_id])
+
+
+@receiver(post_save, sender=Project)
+def bump_project_version(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    Project.objects.bump_versions(pk=instance.pk)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def invalidate_project_counts(sender, instance, **kwargs):
+    # a project's filtered fields, such as its status, may have changed too
+    invalidate_counts()
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def invalidate_status_registry(sender, instance, **kwargs):
+    status_registry.invalidate()
+
+
+@receiver(request_started)
+def reset_status_registry_version_check(sender, **kwargs):
+    status_registry.reset_version_check()
+
+
+@receiver(post_save, sender=Status)
+@receiver(pre_delete, sender=Status)
+def bump_status_project_versions(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    Project.objects.bump_versions(status=instance)
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_delete, sender=Technician)
+def invalidate_technicians(sender, instance, **kwargs):
+    invalidate_session_technicians()
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_delete, sender=Technician)
+def invalidate_technician_choices(sender, instance, **kwargs):
+    technician_choices.invalidate()
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_choices(sender, instance, **kwargs):
+    # logging in saves last_login, which does not change the choices
+    if kwargs.get('update_fields') is not None and set(kwargs['update_fields']) <= {'last_login'}:
+        return
+
+    user_choices.invalidate()
+
+
+@receiver(post_save, sender=Technician)
+@receiver(pre_delete, sender=Technician)
+def bump_technician_project_versions(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    Project.objects.bump_versions(Q(technician=instance) | Q(created_by=instance))
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    search.index_project(instance)
+
+
+@receiver(post_delete, sender=Project)
+def remove_project_from_index(sender, instance, **kwargs):
+    search.remove_project(instance)
+
+
+@receiver(post_save, sender=ProjectNote)
+def index_projectnote(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    search.index_note(instance)
+
+
+@receiver(post_delete, sender=ProjectNote)
+def remove_projectnote_from_index(sender, instance, **kwargs):
+    search.remove_note(instance)
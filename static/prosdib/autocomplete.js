@@ -0,0 +1,71 @@
+// Adds a search box before each select.autocompleteselect (see forms.AutocompleteSelect)
+// and replaces the unselected options with the results from its data-autocomplete-url
+function addAutocompleteSearch(select) {
+  let search = document.createElement('input')
+  search.type = 'search'
+  search.placeholder = 'search'
+  search.className = 'autocompletesearch'
+  select.parentNode.insertBefore(search, select)
+
+  let timer = null
+  let page = 1
+  let selectedValue = select.value
+
+  function loadChoices(append) {
+    let url = select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(search.value) + '&page=' + page
+    fetch(url, {credentials: 'same-origin'})
+      .then(response => response.json())
+      .then(function(data) {
+        for( let option of Array.from(select.options) ) {
+          if( option.classList.contains('autocompletemore') ) {
+            option.remove()
+          } else if( !append && !option.selected && option.value != '' ) {
+            option.remove()
+          }
+        }
+        for( let result of data.results ) {
+          if( select.querySelector("option[value='" + result.id + "']") == null ) {
+            let option = document.createElement('option')
+            option.value = result.id
+            option.text = result.text
+            if( result.home ) {
+              option.dataset.home = result.home
+            }
+            select.appendChild(option)
+          }
+        }
+        if( data.more ) {
+          let more = document.createElement('option')
+          more.value = ''
+          more.text = 'more...'
+          more.className = 'autocompletemore'
+          select.appendChild(more)
+        }
+      })
+  }
+
+  search.addEventListener('input', function(e) {
+    clearTimeout(timer)
+    timer = setTimeout(function() {
+      page = 1
+      loadChoices(false)
+    }, 250)
+  })
+
+  select.addEventListener('change', function(e) {
+    let selected = select.options[select.selectedIndex]
+    if( selected && selected.classList.contains('autocompletemore') ) {
+      page = page + 1
+      select.value = selectedValue
+      loadChoices(true)
+    } else {
+      selectedValue = select.value
+    }
+  })
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  for( let select of document.querySelectorAll('select.autocompleteselect') ) {
+    addAutocompleteSearch(select)
+  }
+})
@@ -0,0 +1,77 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Technician
+
+SESSION_KEY = "prosdib_technician"
+VERSION_KEY = "prosdib:technician-version"
+
+
+def get_timeout():
+    return getattr(settings, "PROSDIB_TECHNICIAN_SESSION_TIMEOUT", 300)
+
+
+def invalidate_session_technicians():
+    """Make every session resolve its technician again, after a Technician is saved or deleted"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, get_timeout())
+
+
+def get_request_technician(request, create=False):
+    """Return the technician of the request's user, or None
+
+    The technician is cached on the request.  Its pk is kept in the session until any Technician is saved or
+    deleted or PROSDIB_TECHNICIAN_SESSION_TIMEOUT seconds pass, so resolving it for display usually costs no
+    query; fields other than the pk and user are loaded if they are used.  With create=True, which callers use
+    before saving rows that refer to the technician, the pk from the session is checked against the database,
+    and a technician is created for a user who has none
+    """
+    technician = getattr(request, "_prosdib_technician", None)
+    if technician is not None or (hasattr(request, "_prosdib_technician") and not create):
+        return technician
+
+    user = request.user
+    if not user.is_authenticated:
+        return None
+
+    version = cache.get(VERSION_KEY)
+    session = getattr(request, "session", None)
+    cached = session.get(SESSION_KEY) if session is not None else None
+
+    from_session = (
+        bool(cached)
+        and cached.get("user") == user.pk
+        and cached.get("version") == version
+        and time.time() - cached.get("checked", 0) < get_timeout()
+    )
+    if from_session and not create:
+        technician = Technician.from_db(
+            Technician.objects.db, ["id", "user_id"], [cached["pk"], user.pk]
+        ) if cached["pk"] else None
+    elif from_session and cached["pk"]:
+        technician = Technician.objects.filter(pk=cached["pk"], user=user).first()
+        from_session = technician is not None
+    else:
+        from_session = False
+
+    if not from_session:
+        technician = Technician.objects.filter(user=user).order_by("pk").first()
+
+    if technician is None and create:
+        technician = Technician.objects.create(user=user, name=user.__str__())
+        version = cache.get(VERSION_KEY)
+        from_session = False
+
+    if session is not None and not from_session:
+        session[SESSION_KEY] = {
+            "user": user.pk,
+            "version": version,
+            "pk": technician.pk if technician else None,
+            "checked": time.time(),
+        }
+
+    request._prosdib_technician = technician
+    return technician
+
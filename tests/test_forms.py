@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from ..forms import ProjectForm, TechnicianForm, UserAutocompleteSelect
+from ..models import Technician
+
+
+class CachedChoicesTests(TestCase):
+
+    fixtures = ['prosdib_test_data.json']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.technician = Technician.objects.create(name="Cached Tech")
+
+    def setUp(self):
+        # choices cached by an earlier test may hold pks which the database has since reused
+        cache.clear()
+
+    def test_project_form_choices_are_cached(self):
+        ProjectForm().as_p()
+        with self.assertNumQueries(0):
+            html = ProjectForm().as_p()
+        self.assertIn("Cached Tech", html)
+
+        Technician.objects.create(name="New Tech")
+        self.assertIn("New Tech", ProjectForm().as_p())
+
+    def test_submitted_values_are_checked_against_cached_ids(self):
+        technician_field = ProjectForm().fields["technician"]
+        ProjectForm().as_p()
+
+        # a cached id costs only the read of the object
+        with self.assertNumQueries(1):
+            self.assertEqual(technician_field.clean(self.technician.pk), self.technician)
+
+        # an id missing from the cache is looked up once before it is rejected
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError):
+                technician_field.clean(999999)
+
+    def test_technician_missed_by_the_cache_is_accepted_and_refreshes_it(self):
+        ProjectForm().as_p()
+        # bulk_create sends no signals, like a change made in another process
+        Technician.objects.bulk_create([Technician(name="Unsignalled Tech")])
+        technician = Technician.objects.get(name="Unsignalled Tech")
+        self.assertNotIn("Unsignalled Tech", ProjectForm().as_p())
+
+        self.assertEqual(ProjectForm().fields["technician"].clean(technician.pk), technician)
+        self.assertIn("Unsignalled Tech", ProjectForm().as_p())
+
+    @override_settings(PROSDIB_USER_CHOICES_LIMIT=1)
+    def test_technician_form_uses_autocomplete_for_many_users(self):
+        for number in range(2):
+            get_user_model().objects.create(username=f"many{ number }")
+
+        form = TechnicianForm()
+        self.assertIsInstance(form.fields["user"].widget, UserAutocompleteSelect)
+        self.assertNotIn("many0", form.as_p())
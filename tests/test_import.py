@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from ..models import History, Project, ProjectNote, Technician
+
+
+class ImportCommandTests(TestCase):
+    fixtures = ['prosdib_test_data.json']
+
+    def write_file(self, suffix, text):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as import_file:
+            import_file.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_csv_groups_notes_and_rebuilds_rollups(self):
+        path = self.write_file('.csv', (
+            "id,title,description,priority,begin,technician,status,note_when,note_maintext,note_time_spent,note_is_current\n"
+            "7,Imported,From the old system,2,2022-01-01T00:00:00+00:00,Import Tech,,2022-01-02T00:00:00+00:00,first,1.5,True\n"
+            "7,Imported,From the old system,2,2022-01-01T00:00:00+00:00,Import Tech,,2022-01-03T00:00:00+00:00,second,0.5,False\n"
+        ))
+        call_command('prosdib_import', path, stdout=StringIO())
+
+        project = Project.objects.get(title='Imported')
+        self.assertEqual(project.technician, Technician.objects.get(name='Import Tech'))
+        self.assertEqual(ProjectNote.objects.filter(project=project).count(), 2)
+        self.assertEqual(project.qty_current_notes, 1)
+        self.assertEqual(project.latest_update_text, 'first')
+        self.assertEqual(float(project.time_spent_total), 2.0)
+        self.assertTrue(History.objects.filter(modelname='Project', objectid=project.pk, fieldname='imported').exists())
+
+    def test_dry_run_and_resume_from_line(self):
+        lines = [json.dumps({'title': f'Line {number}', 'notes': [{'maintext': 'note'}]}) for number in range(1, 4)]
+        path = self.write_file('.jsonl', '\n'.join(lines))
+        projects_before = Project.objects.count()
+
+        call_command('prosdib_import', path, dry_run=True, stdout=StringIO())
+        self.assertEqual(Project.objects.count(), projects_before)
+
+        call_command('prosdib_import', path, resume_from_line=2, batch_size=1, stdout=StringIO())
+        self.assertEqual(list(Project.objects.filter(title__startswith='Line ').order_by('title').values_list('title', flat=True)), ['Line 2', 'Line 3'])
+
+    def test_batches_before_a_failure_keep_their_rollups(self):
+        path = self.write_file('.jsonl', '\n'.join([
+            json.dumps({'title': 'Before Failure', 'notes': [{'maintext': 'kept', 'is_current': True}]}),
+            json.dumps({'title': 'Failure', 'priority': 'not a number'}),
+        ]))
+        with self.assertRaises(CommandError):
+            call_command('prosdib_import', path, batch_size=1, stdout=StringIO())
+
+        project = Project.objects.get(title='Before Failure')
+        self.assertEqual(project.qty_current_notes, 1)
+        self.assertEqual(project.latest_update_text, 'kept')
+        self.assertFalse(Project.objects.filter(title='Failure').exists())
+
+    def test_resume_from_reported_line_does_not_repeat_projects(self):
+        path = self.write_file('.csv', (
+            "id,title,note_maintext\n"
+            "1,Resume One,first\n"
+            "1,Resume One,second\n"
+            "2,Resume Two,third\n"
+        ))
+        output = StringIO()
+        call_command('prosdib_import', path, batch_size=1, stdout=output)
+        first_batch = output.getvalue().splitlines()[0]
+        self.assertEqual(first_batch, 'Imported through line 3, resume with --resume-from-line 4')
+
+        call_command('prosdib_import', path, resume_from_line=4, stdout=StringIO())
+        self.assertEqual(Project.objects.filter(title='Resume One').count(), 1)
+        self.assertEqual(Project.objects.filter(title='Resume Two').count(), 2)
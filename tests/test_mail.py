@@ -0,0 +1,94 @@
+from django.core import mail
+from django.db import connection
+from unittest import mock
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+import datetime
+from ..mail import compose_project_mail, queue_digest_events, queue_mail, send_digests, send_outbox
+from ..models import DigestEvent, OutboxMessage, Project, ProjectNote
+
+
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(title="project outbox")
+
+    def test_send_outbox_sends_queued_mail(self):
+        for number in range(3):
+            queue_mail(f"Subject { number }", "Body", "from@example.com", ["one@example.com", "two@example.com"], project=self.project)
+
+        sent, failed = send_outbox(batch_size=10)
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ["one@example.com", "two@example.com"])
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.STATUS_SENT).count(), 3)
+
+    @mock.patch("prosdib.mail.get_connection")
+    def test_send_outbox_retries_then_fails(self, get_connection):
+        # a mail server which cannot be reached, without depending on the network
+        get_connection.return_value.open.side_effect = ConnectionRefusedError("Connection refused")
+        outbox_message = queue_mail("Subject", "Body", "from@example.com", ["one@example.com"])
+
+        sent, failed = send_outbox(batch_size=10, max_attempts=2, retry_delay=0)
+        outbox_message.refresh_from_db()
+        self.assertEqual((sent, failed), (0, 1))
+        self.assertEqual(outbox_message.status, OutboxMessage.STATUS_PENDING)
+        self.assertEqual(outbox_message.attempts, 1)
+
+        send_outbox(batch_size=10, max_attempts=2, retry_delay=0)
+        outbox_message.refresh_from_db()
+        self.assertEqual(outbox_message.status, OutboxMessage.STATUS_DEAD)
+
+
+class DigestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects = [Project.objects.create(title=f"project digest { number }") for number in range(3)]
+
+    def test_send_digests_queues_one_message_per_recipient(self):
+        for project in self.projects:
+            queue_digest_events(project, ["one@example.com", "two@example.com"], "http://example.com/", is_new=True)
+            queue_digest_events(project, ["one@example.com"])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(send_digests(), 2)
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("SELECT")]), 1)
+
+        self.assertFalse(DigestEvent.objects.exists())
+        one = OutboxMessage.objects.get(recipients="one@example.com")
+        self.assertIn("3 projects", one.subject)
+        for project in self.projects:
+            self.assertIn(project.title, one.message)
+        self.assertIn("Changes: 2", one.message)
+
+        self.assertEqual(send_digests(), 0)
+
+
+class ComposeProjectMailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(title="Printer <jammed>", description="Tray two")
+        # midday, so the date is the same in TIME_ZONE, which the date filter converts to
+        ProjectNote.objects.create(project=cls.project, maintext="Ordered a roller", is_current=True, when=datetime.datetime(2022, 1, 2, 12, tzinfo=datetime.timezone.utc))
+        ProjectNote.objects.create(project=cls.project, maintext="Old note", is_current=False, when=datetime.datetime(2022, 1, 1, 12, tzinfo=datetime.timezone.utc))
+
+    def test_compose_project_mail(self):
+        with self.assertNumQueries(2):
+            subject, message, html_message = compose_project_mail(self.project.pk, "http://example.com/project/", is_new=True)
+
+        self.assertEqual(subject, "Tech Project Submitted: Printer <jammed>")
+        self.assertIn("2022-01-02: Ordered a roller", message)
+        self.assertNotIn("Old note", message)
+        self.assertEqual(message.count("Notes:"), 1)
+        self.assertIn("Printer &lt;jammed&gt;", html_message)
+        self.assertNotIn("[", html_message)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(compose_project_mail(self.project.pk, "http://example.com/project/", is_new=True), (subject, message, html_message))
+
+        ProjectNote.objects.create(project=self.project, maintext="Installed the roller", is_current=True)
+        self.assertIn("Installed the roller", compose_project_mail(self.project.pk, "http://example.com/project/", is_new=True)[1])
@@ -1,6 +1,12 @@
-from django.test import TestCase
-from ..models import Project
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, override_settings
+from ..models import History, Project, ProjectNote, Status, Subscription
+from ..registry import status_registry
+from ..views import VistaProjectQuerySet
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+import datetime
 
 class ProjectTests(TestCase):
 
@@ -16,3 +22,147 @@ class ProjectTests(TestCase):
     def test_project_str_is_name(self):
         self.assertEqual(self.project_one.__str__(), self.project_one.title)
 
+class ProjectRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(
+            title="project rollups"
+        )
+
+    def test_rollups_follow_note_writes(self):
+        first = ProjectNote.objects.create(project=self.project, maintext="first", is_current=True, time_spent=Decimal('1.25'), when=datetime.datetime(2022, 1, 1))
+        ProjectNote.objects.create(project=self.project, maintext="second", is_current=True, time_spent=Decimal('0.50'), when=datetime.datetime(2022, 1, 2))
+        ProjectNote.objects.create(project=self.project, maintext="old", is_current=False, time_spent=Decimal('2.00'), when=datetime.datetime(2022, 1, 3))
+
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.qty_current_notes, 2)
+        self.assertEqual(project.time_spent_total, Decimal('3.75'))
+        self.assertEqual(project.latest_update_text, "second")
+
+        ProjectNote.objects.filter(maintext="second").delete()
+        first.time_spent = Decimal('3.00')
+        first.save()
+
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.qty_current_notes, 1)
+        self.assertEqual(project.time_spent_total, Decimal('5.00'))
+        self.assertEqual(project.latest_update_text, "first")
+
+    def test_stored_activity_matches_live_activity(self):
+        ProjectNote.objects.create(project=self.project, maintext="current", is_current=True, when=datetime.datetime(2022, 1, 1))
+        ProjectNote.objects.create(project=self.project, maintext="old", is_current=False, when=datetime.datetime(2022, 1, 2))
+        project = Project.objects.with_activity(live=True).get(pk=self.project.pk)
+        self.assertEqual(project.latest_update_when, project.live_latest_update_when)
+        self.assertEqual(project.qty_current_notes, project.live_qty_current_notes)
+
+    def test_default_queryset_has_no_activity_ordering(self):
+        self.assertNotIn("latest_update_when", str(Project.objects.all().query).split("ORDER BY")[-1])
+
+    def test_default_ordering_does_not_join_status(self):
+        self.assertNotIn("prosdib_status", str(Project.objects.all().query))
+
+    def test_rollups_empty_project(self):
+        Project.objects.update_rollups()
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.qty_current_notes, 0)
+        self.assertEqual(project.time_spent_total, 0)
+        self.assertIsNone(project.latest_update_when)
+
+class HistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects = [Project.objects.create(title=f"project { number }") for number in range(3)]
+        for project in cls.projects:
+            History.objects.create(modelname="Project", objectid=project.pk, fieldname="title", new_value=project.title)
+        History.objects.create(modelname="Project", objectid=0, fieldname="title", new_value="removed")
+
+    def test_resolve_objects_uses_one_query_per_model(self):
+        with self.assertNumQueries(2):
+            histories = list(History.objects.all().resolve_objects())
+            descriptions = [str(history) for history in histories]
+
+        for project in self.projects:
+            self.assertTrue(any(f"[{ project.title }]" in description for description in descriptions))
+        self.assertTrue(any(": Project: 0 [title]" in description for description in descriptions))
+
+class StatusRegistryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.open = Status.objects.create(name="Open", list_position=1, is_default=True)
+        cls.closed = Status.objects.create(name="Closed", list_position=2, is_active=False)
+
+    def test_default_status_is_cached(self):
+        status_registry.get_statuses()
+        with self.assertNumQueries(1):
+            projects = [Project(title=f"project { number }") for number in range(5)]
+            Project.objects.bulk_create(projects)
+        self.assertEqual({project.status_id for project in projects}, {self.open.pk})
+
+    def test_version_is_read_once_per_check(self):
+        status_registry.get_statuses()
+        with mock.patch("prosdib.registry.cache") as registry_cache:
+            for number in range(5):
+                Project(title=f"project { number }")
+        registry_cache.get.assert_not_called()
+
+        status_registry.reset_version_check()
+        with mock.patch("prosdib.registry.cache") as registry_cache:
+            status_registry.get_default_status()
+        registry_cache.get.assert_called_once()
+
+    def test_registry_reloads_after_timeout(self):
+        status_registry.get_statuses()
+        Status.objects.filter(pk=self.closed.pk).update(name="Done")
+        with override_settings(PROSDIB_STATUS_REGISTRY_TIMEOUT=-1):
+            self.assertEqual(status_registry.get(self.closed.pk).name, "Done")
+
+    def test_registry_version_changes_on_commit(self):
+        version = cache.get(status_registry.version_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.closed.save()
+            self.assertEqual(cache.get(status_registry.version_key), version)
+        self.assertNotEqual(cache.get(status_registry.version_key), version)
+
+    def test_registry_follows_status_changes(self):
+        self.assertEqual(status_registry.get_active_status_ids(), [self.open.pk])
+        self.closed.is_active = True
+        self.closed.save()
+        self.assertEqual(status_registry.get_active_status_ids(), [self.open.pk, self.closed.pk])
+
+    def test_is_active_filter_does_not_join_status(self):
+        Project.objects.create(title="open project", status=self.open)
+        Project.objects.create(title="closed project", status=self.closed)
+        queryset = VistaProjectQuerySet(model=Project).filter(status__is_active=True)
+        self.assertNotIn("prosdib_status", str(queryset.query))
+        self.assertEqual([project.title for project in queryset], ["open project"])
+
+    def test_is_active_filter_is_left_alone_outside_the_project_list(self):
+        self.assertIn("prosdib_status", str(Project.objects.filter(status__is_active=True).query))
+
+
+class SubscriptionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="subscriber", email="subscriber@example.com")
+        cls.projects = [Project.objects.create(title=f"subscribed { number }") for number in range(3)]
+
+    def test_subscribe_and_unsubscribe(self):
+        Subscription.objects.subscribe(self.projects, "subscriber@EXAMPLE.com, other@example.com")
+        Subscription.objects.subscribe(self.projects[:1], ["subscriber@example.com"])
+
+        self.assertEqual(Subscription.objects.count(), 6)
+        self.assertEqual(Subscription.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Subscription.objects.for_user(self.user).count(), 3)
+
+        Subscription.objects.unsubscribe(self.projects[1:], ["subscriber@example.com"])
+        self.assertEqual([subscription.project for subscription in Subscription.objects.for_user(self.user)], self.projects[:1])
+
+    def test_set_project_emails(self):
+        Subscription.objects.set_project_emails(self.projects[0], "one@example.com,\ntwo@example.com")
+        Subscription.objects.set_project_emails(self.projects[0], "two@example.com; three@example.com")
+
+        self.assertEqual(sorted(self.projects[0].get_recipient_emails()), ["three@example.com", "two@example.com"])
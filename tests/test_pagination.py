@@ -0,0 +1,54 @@
+import datetime
+from django.test import TestCase
+from ..models import Project, ProjectNote
+from django.http import QueryDict
+from ..pagination import CachedCountPaginator, KeysetPaginator, make_cache_key
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(11):
+            project = Project.objects.create(title=f"project { number }", priority=number % 3 + 1)
+            if number % 2:
+                ProjectNote.objects.create(project=project, maintext="current", is_current=True, when=datetime.datetime(2022, 1, number % 4 + 1))
+
+    def test_pages_follow_keyset_ordering(self):
+        ordering = ("latest_update_when", "priority", "pk")
+        paginator = KeysetPaginator(Project.objects.all(), 4, ordering)
+        expected = list(Project.objects.order_by(*ordering))
+        expected.sort(key=lambda project: (project.latest_update_when is not None, project.latest_update_when or datetime.datetime.min.replace(tzinfo=datetime.timezone.utc), project.priority, project.pk))
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+
+        self.assertEqual([project for page in pages for project in page], expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual(previous.object_list, pages[-2].object_list)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Project.objects.all(), 4, ("latest_update_when", "priority", "pk"))
+        self.assertEqual(paginator.page("not-a-cursor").object_list, paginator.page().object_list)
+
+
+class CachedCountPaginatorTests(TestCase):
+
+    def test_count_is_cached_until_projects_change(self):
+        Project.objects.create(title="project one")
+        querydict = QueryDict("filter__fieldname__0=title")
+
+        paginator = CachedCountPaginator(Project.objects.all(), 10, count_cache_key=make_cache_key("test-count", querydict))
+        self.assertEqual(paginator.count, 1)
+
+        with self.assertNumQueries(0):
+            paginator = CachedCountPaginator(Project.objects.all(), 10, count_cache_key=make_cache_key("test-count", querydict))
+            self.assertEqual(paginator.count, 1)
+
+        Project.objects.create(title="project two")
+        paginator = CachedCountPaginator(Project.objects.all(), 10, count_cache_key=make_cache_key("test-count", querydict))
+        self.assertEqual(paginator.count, 2)
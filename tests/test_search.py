@@ -0,0 +1,36 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from ..models import Project, ProjectNote
+from ..search import get_search_connection, is_search_indexed, search_projects
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.printer = Project.objects.create(title="Printer jams", description="The lobby printer")
+        cls.network = Project.objects.create(title="Network outage", description="Branch switch")
+        ProjectNote.objects.create(project=cls.network, maintext="Replaced the <switch> power supply", details="")
+
+    def test_search_finds_project_by_title(self):
+        results = search_projects("printer")
+        self.assertEqual([result["project"] for result in results], [self.printer])
+
+    def test_search_finds_project_by_note(self):
+        results = search_projects("power")
+        self.assertEqual([result["project"] for result in results], [self.network])
+
+    @skipUnless(connection.vendor in ("sqlite", "postgresql"), "snippets need SQLite FTS5 or PostgreSQL full text search")
+    def test_search_note_snippet_is_highlighted_and_escaped(self):
+        if not is_search_indexed(get_search_connection()):
+            self.skipTest("the search table was not created on this database")
+
+        results = search_projects("power")
+        self.assertEqual(len(results[0]["snippets"]), 1)
+        self.assertIn("<mark>power</mark>", results[0]["snippets"][0])
+        self.assertIn("&lt;switch&gt;", results[0]["snippets"][0])
+
+    def test_search_follows_note_deletes(self):
+        ProjectNote.objects.filter(project=self.network).delete()
+        self.assertEqual(search_projects("power"), [])
@@ -1,13 +1,21 @@
-from django.test import  SimpleTestCase, TestCase, Client
+from django.test import  SimpleTestCase, TestCase, Client, override_settings
+from django.conf import settings
 from ..forms import ProjectForm
-from ..models import Project, Technician, Status
+from ..instrumentation import QueryBudgetMixin
+from ..technicians import VERSION_KEY
+from ..models import History, Project, ProjectNote, Subscription, Technician, Status
+from ..registry import status_registry
 from django.urls import reverse
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.management import call_command
-import time, datetime
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import time, datetime, json
 
 
-class ViewTests(TestCase):
+class ViewTests(QueryBudgetMixin, TestCase):
 
     fixtures=['prosdib_test_data.json']
 
@@ -17,11 +25,184 @@ class ViewTests(TestCase):
         cls.user = get_user_model().objects.create_user(username='alpha', password='alpha', is_superuser=True)
         cls.tech = Technician.objects.create(user=cls.user, name="Alpha")
 
+    def setUp(self):
+        # rendered rows are cached by project pk, which the database reuses between tests
+        cache.clear()
+
     def test_project_list_view(self):
         client = Client()
         response = client.get('/prosdib/project/')
         self.assertEqual(response.url, '/prosdib/project/list/')
 
+    def test_project_list_queries_do_not_grow_with_rows(self):
+        status = Status.objects.first()
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        def count_list_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = client.get('/prosdib/project/list/')
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries)
+
+        # the status registry loads once, on whichever request comes first
+        status_registry.get_statuses()
+
+        project = Project.objects.create(title='Project One', status=status, technician=self.tech)
+        ProjectNote.objects.create(project=project, maintext='Note One', is_current=True)
+        one_row_queries = count_list_queries()
+
+        for number in range(5):
+            project = Project.objects.create(title=f'Project { number }', status=status, technician=self.tech)
+            ProjectNote.objects.create(project=project, maintext=f'Note { number }', is_current=True)
+
+        self.assertEqual(count_list_queries(), one_row_queries)
+
+    def test_post_project_update_records_history_in_one_insert(self):
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        project = Project.objects.create( title='Project before post', priority=4 )
+        with CaptureQueriesContext(connection) as context:
+            client.post(f'/prosdib/project/{ project.pk }/update/', {
+                'title': 'Project after post', 'begin': '1/2/2021', 'priority': 1, 'status': 1,
+                'projectnote_set-TOTAL_FORMS': 0, 'projectnote_set-INITIAL_FORMS': 0,
+            })
+        histories = History.objects.filter(modelname='Project', objectid=project.pk)
+        self.assertEqual(histories.get(fieldname='title').old_value, 'Project before post')
+        self.assertEqual(histories.get(fieldname='priority').old_value, '4')
+        history_inserts = [query for query in context.captured_queries if query['sql'].startswith('INSERT') and 'prosdib_history' in query['sql']]
+        self.assertEqual(len(history_inserts), 1)
+
+    def test_post_project_update_with_invalid_notes_saves_nothing(self):
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        project = Project.objects.create( title='Project before post', priority=4 )
+        response = client.post(f'/prosdib/project/{ project.pk }/update/', {'title': 'Project after post', 'begin': '1/2/2021', 'priority': 1, 'status': 1})
+        self.assertEqual(response.status_code, 200)
+        project.refresh_from_db()
+        self.assertEqual(project.title, 'Project before post')
+        self.assertFalse(History.objects.filter(modelname='Project', objectid=project.pk).exists())
+
+    def test_project_list_rows_refresh_after_changes(self):
+        status = Status.objects.first()
+        project = Project.objects.create(title='Project Cached', status=status)
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        self.assertContains(client.get('/prosdib/project/list/'), 'Project Cached')
+
+        ProjectNote.objects.create(project=project, maintext='Fresh note', is_current=True)
+        self.assertContains(client.get('/prosdib/project/list/'), 'Fresh note')
+
+        status.name = 'Renamed Status'
+        status.save()
+        self.assertContains(client.get('/prosdib/project/list/'), 'Renamed Status')
+
+    def test_project_detail_conditional_get(self):
+        project = Project.objects.create( title='Project Conditional', status=Status.objects.first() )
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        response = client.get( f'/prosdib/project/{ project.pk }/detail/' )
+        etag = response['ETag']
+
+        response = client.get( f'/prosdib/project/{ project.pk }/detail/', HTTP_IF_NONE_MATCH=etag )
+        self.assertEqual(response.status_code, 304)
+
+        ProjectNote.objects.create(project=project, maintext='Changed', is_current=True)
+        response = client.get( f'/prosdib/project/{ project.pk }/detail/', HTTP_IF_NONE_MATCH=etag )
+        self.assertEqual(response.status_code, 200)
+
+    def test_project_list_conditional_get(self):
+        Project.objects.create( title='Project Conditional', status=Status.objects.first() )
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        etag = client.get('/prosdib/project/list/')['ETag']
+        self.assertEqual(client.get('/prosdib/project/list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Project.objects.create( title='Project Added', status=Status.objects.first() )
+        self.assertEqual(client.get('/prosdib/project/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_project_list_counts_projects_once(self):
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(client.get('/prosdib/project/list/').status_code, 200)
+        counts = [query for query in context.captured_queries if 'COUNT(' in query['sql'] and 'prosdib_project' in query['sql']]
+        self.assertEqual(len(counts), 1)
+
+    def test_project_list_validators_follow_the_filtered_projects(self):
+        listed = Project.objects.create( title='Project Listed', status=Status.objects.get(pk=2) )
+        closed = Status.objects.create(name='Closed', is_active=False)
+        Project.objects.create( title='Project Closed', status=closed )
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        response = client.get('/prosdib/project/list/')
+        listed.refresh_from_db()
+        self.assertEqual(response['Last-Modified'], http_date(int(listed.updated_at.timestamp())))
+        self.assertIn('Cookie', response['Vary'])
+
+        etag = response['ETag']
+        Project.objects.create( title='Project Closed Too', status=closed )
+        self.assertEqual(client.get('/prosdib/project/list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        get_user_model().objects.create_user(username='beta', password='beta', is_superuser=True)
+        client.login(username='beta', password='beta')
+        self.assertEqual(client.get('/prosdib/project/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_project_export(self):
+        project = Project.objects.create(title='Project Export', status=Status.objects.first(), technician=self.tech)
+        ProjectNote.objects.create(project=project, maintext='Exported note', is_current=True)
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        response = client.get('/prosdib/project/export/?notes=1')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Project Export', content)
+        self.assertIn('Exported note', content)
+
+        response = client.get('/prosdib/project/export/?format=jsonl&notes=1')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        row = [row for row in rows if row['title'] == 'Project Export'][0]
+        self.assertEqual(row['technician'], 'Alpha')
+        self.assertEqual(row['notes'][0]['maintext'], 'Exported note')
+
+    @override_settings(PROSDIB_EXPORT_CHUNK_SIZE=2)
+    def test_project_export_prefetches_each_chunk(self):
+        for number in range(6):
+            project = Project.objects.create(title=f'Project Chunk { number }', status=Status.objects.first())
+            ProjectNote.objects.create(project=project, maintext=f'Chunk note { number }', is_current=True)
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/prosdib/project/export/?format=jsonl&notes=1')
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        chunks = (len(rows) + 1) // 2
+        note_queries = [query for query in context.captured_queries if '"prosdib_projectnote"."project_id" IN (' in query['sql']]
+        self.assertEqual(len(note_queries), chunks)
+        self.assertEqual(len([row for row in rows if row['title'].startswith('Project Chunk')]), 6)
+
+    def test_project_detail_view_query_budget(self):
+        project = Project.objects.create( title='Project Budget', status=Status.objects.first(), technician=self.tech )
+        for number in range(5):
+            ProjectNote.objects.create(project=project, maintext=f'Note { number }', is_current=True)
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        with self.assertQueryBudget(15):
+            response = client.get( f'/prosdib/project/{ project.pk }/detail/' )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(
+        PROSDIB_INSTRUMENTATION=True,
+        MIDDLEWARE=settings.MIDDLEWARE + ['prosdib.instrumentation.QueryInstrumentationMiddleware'],
+    )
+    def test_instrumentation_headers(self):
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        response = client.get('/prosdib/project/list/')
+        self.assertEqual(response['X-Prosdib-View'], 'project-list')
+        self.assertGreater(int(response['X-Prosdib-Queries']), 0)
+
     def test_project_detail_view(self):
         project_title = "Project Alpha"
         status = Status.objects.first()
@@ -30,7 +211,6 @@ class ViewTests(TestCase):
         client = Client()
         client.login(username='alpha', password='alpha')
         response = client.get( f'/prosdib/project/{ project_alpha_pk }/detail/' )
-        time.sleep(3)
         self.assertContains(response, project_title)
 
 
@@ -75,10 +255,40 @@ class ViewTests(TestCase):
         client = Client()
         client.login(username='alpha', password='alpha')
         response = client.get( f'/prosdib/project/{ project_alpha_pk }/update/' )
-        time.sleep(3)
         self.assertContains(response, project_title)
 
 
+    @override_settings(PROSDIB_RECENT_NOTES=2)
+    def test_get_project_update_view_recent_notes(self):
+        project = Project.objects.create(title="Project With History", priority=1)
+        for day in range(1, 6):
+            ProjectNote.objects.create(project=project, maintext=f"note {day}", when=datetime.datetime(2022, 1, day, tzinfo=datetime.timezone.utc), is_current=day == 1)
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        response = client.get(f'/prosdib/project/{ project.pk }/update/')
+        self.assertEqual([form.instance.maintext for form in response.context['projectnotes'].initial_forms], ["note 5", "note 4", "note 1"])
+        self.assertEqual(len(response.context['projectnotes'].extra_forms), 1)
+
+        response = client.get(reverse('prosdib:projectprojectnote-list', args=[project.pk]))
+        self.assertEqual([note.maintext for note in response.context['object_list']], ["note 3", "note 2"])
+
+    @override_settings(PROSDIB_RECENT_NOTES=2)
+    def test_recent_notes_with_the_same_when_are_shown_once(self):
+        project = Project.objects.create(title="Project With Ties", priority=1)
+        when = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+        for number in range(1, 5):
+            ProjectNote.objects.create(project=project, maintext=f"tie {number}", when=when)
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        response = client.get(f'/prosdib/project/{ project.pk }/update/')
+        self.assertEqual([form.instance.maintext for form in response.context['projectnotes'].initial_forms], ["tie 4", "tie 3"])
+
+        response = client.get(reverse('prosdib:projectprojectnote-list', args=[project.pk]))
+        self.assertEqual([note.maintext for note in response.context['object_list']], ["tie 2", "tie 1"])
+
+
     def test_post_project_update_view_no_auth(self):
         client = Client()
         project = Project.objects.create( title='Project before post' )
@@ -96,6 +306,53 @@ class ViewTests(TestCase):
         project = Project.objects.get( pk=ppk )
         self.assertEqual(project.title, 'Project after post')
 
+    def test_post_project_update_view_sets_subscriptions(self):
+        client = Client()
+        client.login(username='alpha', password='alpha')
+        project = Project.objects.create(title='Project with subscribers')
+        client.post(f'/prosdib/project/{ project.pk }/update/', {'title': project.title, 'begin': '1/2/2021', 'priority': 1, 'status': 1, 'recipient_emails': 'one@example.com,\ntwo@example.com'})
+        self.assertEqual(sorted(project.get_recipient_emails()), ['one@example.com', 'two@example.com'])
+
+    def test_subscription_list_view(self):
+        self.user.email = 'alpha@example.com'
+        self.user.save()
+        projects = [Project.objects.create(title=f'Subscribed { number }') for number in range(2)]
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        client.post(reverse('prosdib:subscription-list'), {'action': 'subscribe', 'project': [project.pk for project in projects]})
+        response = client.get(reverse('prosdib:subscription-list'))
+        self.assertEqual([subscription.project for subscription in response.context['object_list']], projects)
+
+        client.post(reverse('prosdib:subscription-list'), {'action': 'unsubscribe', 'project': [projects[0].pk]})
+        self.assertEqual(list(Subscription.objects.values_list('project', flat=True)), [projects[1].pk])
+
+    def test_subscription_list_post_validates_projects_and_bumps_versions(self):
+        self.user.email = 'alpha@example.com'
+        self.user.save()
+        project = Project.objects.create(title='Versioned subscription')
+        version = Project.objects.get(pk=project.pk).version
+        client = Client()
+        client.login(username='alpha', password='alpha')
+
+        response = client.post(reverse('prosdib:subscription-list'), {'action': 'subscribe', 'project': [project.pk, 999999]}, follow=True)
+        self.assertFalse(Subscription.objects.exists())
+        self.assertTrue(any('project' in str(message) for message in response.context['messages']))
+
+        client.post(reverse('prosdib:subscription-list'), {'action': 'subscribe', 'project': [project.pk]})
+        self.assertGreater(Project.objects.get(pk=project.pk).version, version)
+
+
+    def test_item_autocomplete_view(self):
+        client = Client()
+        response = client.get(reverse('prosdib:item-autocomplete'), {'q': 'zz'})
+        self.assertEqual(response.status_code, 302)
+
+        client.login(username='alpha', password='alpha')
+        response = client.get(reverse('prosdib:item-autocomplete'), {'q': 'no such item', 'page': 'x'})
+        self.assertEqual(response.json(), {'results': [], 'more': False})
+
+
 class ProjectCreateProjectNoteFormsetTests(TestCase):
 
     fixtures = ['prosdib_test_data.json']
@@ -178,3 +435,46 @@ class ProjectUpdateProjectNoteFormsetTests(TestCase):
             'projectnote_set-3-maintext':'',
         })
         self.assertEqual(Project.objects.count(), 1)
+
+class TechnicianResolutionTests(TestCase):
+
+    fixtures = ['prosdib_test_data.json']
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = get_user_model().objects.create_user( username = "alpha", password = "alpha", is_superuser = True )
+
+    def test_note_create_makes_one_technician(self):
+        project = Project.objects.create( title='Project Technician', status=Status.objects.first() )
+        c = Client()
+        c.login(username = "alpha", password="alpha")
+        for number in range(2):
+            c.post(f'/prosdib/project/{ project.pk }/projectnote/create', {
+                'when': '2021-11-19 00:00:00',
+                'maintext': f'Note { number }',
+                'time_spent': 0,
+            })
+        self.assertEqual(Technician.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(ProjectNote.objects.filter(submitted_by__user=self.user).count(), 2)
+
+    def test_technician_deleted_without_invalidation_is_not_reused(self):
+        project = Project.objects.create( title='Project Technician', status=Status.objects.first() )
+        c = Client()
+        c.login(username = "alpha", password="alpha")
+        data = {'when': '2021-11-19 00:00:00', 'maintext': 'Note', 'time_spent': 0}
+        c.post(f'/prosdib/project/{ project.pk }/projectnote/create', data)
+
+        # as if the technician were deleted by a process which does not share this cache
+        version = cache.get(VERSION_KEY)
+        ProjectNote.objects.all().delete()
+        Technician.objects.filter(user=self.user).delete()
+        cache.set(VERSION_KEY, version)
+
+        c.post(f'/prosdib/project/{ project.pk }/projectnote/create', data)
+        self.assertEqual(ProjectNote.objects.filter(submitted_by__user=self.user).count(), 1)
+
+    def test_user_is_tech(self):
+        self.assertFalse(Technician.user_is_tech(self.user))
+        Technician.objects.create(user=self.user, name='Alpha')
+        self.assertTrue(Technician.user_is_tech(self.user))
@@ -12,7 +12,10 @@ urlpatterns = [
     path('project/<int:pk>/detail/', views.ProjectDetail.as_view(), name='project-detail'),
     path('project/<int:pk>/delete/', views.ProjectSoftDelete.as_view(), name='project-delete'),
     path('project/list/', views.ProjectList.as_view(), name='project-list'),
+    path('project/search/', views.ProjectSearch.as_view(), name='project-search'),
+    path('project/export/', views.ProjectExport.as_view(), name='project-export'),
     path('project/<int:projectpk>/projectnote/create', views.ProjectProjectNoteCreate.as_view(), name='projectprojectnote-create'),
+    path('project/<int:projectpk>/projectnote/list/', views.ProjectProjectNoteList.as_view(), name='projectprojectnote-list'),
     path('technician/', RedirectView.as_view(url=reverse_lazy('prosdib:technician-list'))),
     path('technician/create/', views.TechnicianCreate.as_view(), name='technician-create'),
     path('technician/<int:pk>/update/', views.TechnicianUpdate.as_view(), name='technician-update'),
@@ -20,5 +23,9 @@ urlpatterns = [
     path('technician/<int:pk>/delete/', views.TechnicianDelete.as_view(), name='technician-delete'),
     path('technician/list/', views.TechnicianList.as_view(), name='technician-list'),
     path('technician/<int:pk>/close/', views.TechnicianClose.as_view(), name="technician-close"),
+    path('item/autocomplete/', views.ItemAutocomplete.as_view(), name='item-autocomplete'),
+    path('user/autocomplete/', views.UserAutocomplete.as_view(), name='user-autocomplete'),
+    path('subscription/list/', views.SubscriptionList.as_view(), name='subscription-list'),
+    path('history/<str:modelname>/<int:objectid>/', views.HistoryList.as_view(), name='history-list'),
 
 ]
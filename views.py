@@ -1,4 +1,4 @@
-import sys
+import hashlib
 import urllib
 from urllib.parse import urlencode
 
@@ -6,13 +6,17 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import PermissionRequiredMixin, UserPassesTestMixin
-from django.core.exceptions import FieldError, ObjectDoesNotExist
-from django.http import QueryDict
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, FieldError, ObjectDoesNotExist
+from django.http import HttpResponseRedirect, JsonResponse, QueryDict, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.db import transaction
 from django.shortcuts import render
 from django.urls import reverse, reverse_lazy
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
+from django.views.generic.base import TemplateView, View
 from django.views.generic.list import ListView
 from libtekin.models import Item, Location, Mmodel
 from tougshire_vistas.models import Vista
@@ -26,37 +30,106 @@ from tougshire_vistas.views import (
     make_vista_fields,
 )
 
+from .export import export_csv_rows, export_jsonl_rows
 from .forms import (
     ProjectForm,
     ProjectProjectNoteForm,
     ProjectProjectNoteFormset,
+    ProjectProjectNoteRecentFormset,
+    SubscriptionChangeForm,
     TechnicianForm,
 )
-from .models import History, Project, ProjectNote, Technician
-from django.db.models import Max, Q
+from .mail import compose_project_mail, get_from_email, is_digest_mode, queue_digest_events, queue_mail
+from .models import (
+    History,
+    Project,
+    ProjectNote,
+    ProjectQuerySet,
+    Subscription,
+    Technician,
+    get_current_notes_prefetch,
+    rewrite_status_lookups,
+)
+from .pagination import CachedCountPaginator, KeysetPaginator, get_count_timeout, make_cache_key
+from .search import search_projects
+from .technicians import get_request_technician
+from django.db.models import Count, Max, Q
 
 
-def update_history(form, modelname, object, user):
-    for fieldname in form.changed_data:
-        try:
-            old_value = (str(form.initial[fieldname]),)
-        except KeyError:
-            old_value = None
-
-        history = History.objects.create(
-            user=user,
-            modelname=modelname,
-            objectid=object.pk,
-            fieldname=fieldname,
-            old_value=old_value,
-            new_value=str(form.cleaned_data[fieldname]),
-        )
+def history_value(value):
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
 
-        history.save()
+
+class HistoryRecorder:
+    """Collect the changed fields of the forms saved in a request and write them as History in one insert
+
+    Forms are added before they are saved, while form.initial still holds the values the instance had
+    when it was loaded.  The new values and the ids of newly created objects are read when save() is called,
+    so save() should be called after the forms and formsets have been saved
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.changes = []
+
+    def add_form(self, form, modelname, object=None):
+        instance = object if object is not None else form.instance
+        adding = instance._state.adding
+
+        for fieldname in form.changed_data:
+            try:
+                field = instance._meta.get_field(fieldname)
+            except FieldDoesNotExist:
+                continue
+
+            old_value = None if adding else history_value(form.initial.get(fieldname))
+            self.changes.append((modelname, instance, instance.pk, field, old_value))
+
+    def add_formset(self, formset, modelname):
+        deleted_forms = formset.deleted_forms if formset.can_delete else []
+        for form in formset.forms:
+            if form in deleted_forms:
+                if form.instance.pk is not None:
+                    self.changes.append((modelname, form.instance, form.instance.pk, None, None))
+            elif form.has_changed():
+                self.add_form(form, modelname)
+
+    def save(self):
+        histories = []
+        for modelname, instance, objectid, field, old_value in self.changes:
+            if field is None:
+                fieldname, new_value = "DELETE", "True"
+            else:
+                fieldname = field.name
+                new_value = history_value(field.value_from_object(instance)) or ""
+
+            histories.append(
+                History(
+                    user=self.user,
+                    modelname=modelname,
+                    objectid=objectid if objectid is not None else instance.pk,
+                    fieldname=fieldname,
+                    old_value=old_value,
+                    new_value=new_value,
+                )
+            )
+
+        self.changes = []
+        return History.objects.bulk_create(histories)
+
+
+def update_history(form, modelname, object, user):
+    history = HistoryRecorder(user)
+    history.add_form(form, modelname, object)
+    history.save()
 
 
 def send_project_mail(project, request, is_new=False):
-    """Send an email
+    """Queue an email to be sent by the prosdib_send_outbox command
 
     Args:
         project: The project about which the email is being sent.  Usually self.object or self.object.project
@@ -65,65 +138,68 @@ def send_project_mail(project, request, is_new=False):
 
     """
 
-    # if it has no @ sign, assume no emails should be sent
-    if not project.recipient_emails.find("@") > 0:
+    mail_recipients = project.get_recipient_emails()
+    if not mail_recipients:
         return
 
     project_url = request.build_absolute_uri(
         reverse("prosdib:project-detail", kwargs={"pk": project.pk})
     )
 
-    mail_subject_action = "Submitted" if is_new else "Updated"
-    mail_subject = f"Tech Project { mail_subject_action }: { project.title }"
+    if is_digest_mode():
+        queue_digest_events(project, mail_recipients, project_url, is_new=is_new)
+        return
 
-    mail_from = (
-        settings.PROSDIB_EMAIL_FROM
-        if hasattr(settings, "PROSDIB_FROM_EMAIL")
-        else settings.DEFAULT_FROM_EMAIL
+    mail_subject, mail_message, mail_html_message = compose_project_mail(
+        project.pk, project_url, is_new=is_new
     )
 
-    mail_message = "\n".join(
-        [
-            f"Title: { project.title }",
-            f"Urgency: { project.get_priority_display() }",
-            f"Description: { project.description }",
-            f"Project URL: { project_url }",
-            f"Notes:\n" + "\n".join(project.get_current_notes()),
-        ]
+    queue_mail(
+        mail_subject,
+        mail_message,
+        get_from_email(),
+        mail_recipients,
+        html_message=mail_html_message,
+        project=project,
     )
-    if project.projectnote_set.all().exists:
-        mail_message = (
-            mail_message + "\nNotes:\n" + "\n".join(project.get_current_notes())
-        )
 
-    mail_html_message = "<br>\n".join(
-        [
-            f"Title: { project.title }",
-            f"Urgency: { project.get_priority_display() }",
-            f"Description: { project.description }",
-            f'Project URL: <a href="{ project_url }">{ project_url }</a>',
-            f"Notes:<br>\n{ project.get_current_notes()}",
-        ]
-    )
 
-    mail_recipients = [email.strip() for email in project.recipient_emails.split(",")]
+class ConditionalGetMixin:
+    """Answer GET requests with 304 Not Modified when the client already has the current page
 
-    try:
-        send_mail(
-            mail_subject,
-            mail_message,
-            mail_from,
-            mail_recipients,
-            html_message=mail_html_message,
-            fail_silently=False,
-        )
-    except Exception as e:
-        messages.add_message(
-            request, messages.WARNING, "There was an error sending emails."
+    Views provide get_validators(), which returns a string to be used as the ETag and a
+    datetime to be used as Last-Modified, either of which may be None
+    """
+
+    def get_validators(self):
+        return None, None
+
+    def get_conditional_response(self, request):
+        """Return a 304 response if the client's copy is current, otherwise None"""
+        if request.method not in ("GET", "HEAD"):
+            return None
+
+        etag, last_modified = self.get_validators()
+        self.etag = quote_etag(etag) if etag else None
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        return get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
         )
-        messages.add_message(request, messages.WARNING, e)
 
-        print(e, " at ", sys.exc_info()[2].tb_lineno)
+    def add_validator_headers(self, response):
+        if getattr(self, "etag", None) and not response.has_header("ETag"):
+            response.headers["ETag"] = self.etag
+        if getattr(self, "last_modified", None) and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(self.last_modified)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        response = self.get_conditional_response(request)
+        if response is not None:
+            return response
+
+        return self.add_validator_headers(super().get(request, *args, **kwargs))
 
 
 class ProjectCreate(PermissionRequiredMixin, CreateView):
@@ -144,51 +220,53 @@ class ProjectCreate(PermissionRequiredMixin, CreateView):
         return context_data
 
     def get_initial(self):
-        tech_emails = [
-            tech.user.email
-            for tech in Technician.objects.filter(is_current=True).filter(
-                user__isnull=False
+        # form_valid needs this again when no recipient emails were posted, so it is built once per request
+        if not hasattr(self, "_initial"):
+            tech_emails = list(
+                Technician.objects.filter(is_current=True, user__isnull=False)
+                .exclude(user__email="")
+                .values_list("user__email", flat=True)
+            )
+            all_recipient_emails = (
+                (tech_emails + [self.request.user.email])
+                if self.request.user.email and self.request.user.email not in tech_emails
+                else tech_emails
             )
-        ]
-        all_recipient_emails = (
-            (tech_emails + [self.request.user.email])
-            if self.request.user.email not in tech_emails
-            else tech_emails
-        )
-        technicians = Technician.objects.filter(user=self.request.user)
-        if technicians.exists:
-            technician = technicians.first()
-        else:
-            technician = None
 
-        return {
-            "recipient_emails": ",\n".join(all_recipient_emails),
-            "technician": technician,
-        }
+            self._initial = {
+                "recipient_emails": ",\n".join(all_recipient_emails),
+                "technician": get_request_technician(self.request),
+            }
+
+        return self._initial.copy()
 
+    @transaction.atomic
     def form_valid(self, form):
+        history = HistoryRecorder(self.request.user)
+        history.add_form(form, "Project")
+
         response = super().form_valid(form)
 
         self.object = form.save(commit=False)
-        technician, created = Technician.objects.get_or_create(
-            user=self.request.user,
-            defaults={"name": self.request.user.__str__()},
-        )
+        technician = get_request_technician(self.request, create=True)
         self.object.submitted_by = technician
 
-        if not "recipient_emails" in self.request.POST:
-            self.object.recipient_emails = self.get_initial()["recipient_emails"]
-
         self.object = form.save()
 
+        if "recipient_emails" in self.request.POST:
+            form.save_subscriptions(self.object)
+        else:
+            form.save_subscriptions(self.object, self.get_initial()["recipient_emails"])
+
         if self.request.POST:
             projectnotes = ProjectProjectNoteFormset(
                 self.request.POST, instance=self.object
             )
 
             if (projectnotes).is_valid():
-                for form in projectnotes.forms:
-                    projectnote = form.save(commit=False)
+                history.add_formset(projectnotes, "ProjectNote")
+                for projectnoteform in projectnotes.forms:
+                    projectnote = projectnoteform.save(commit=False)
                     if projectnote.submitted_by is None:
                         projectnote.submitted_by = technician
                 projectnotes.save()
@@ -198,6 +276,8 @@ class ProjectCreate(PermissionRequiredMixin, CreateView):
         else:
             projectnotes = ProjectProjectNoteFormset(instance=self.object)
 
+        history.save()
+
         if "send_mail" in self.request.POST:
             send_project_mail(self.object, self.request, is_new=True)
 
@@ -207,54 +287,99 @@ class ProjectCreate(PermissionRequiredMixin, CreateView):
         return reverse_lazy("prosdib:project-detail", kwargs={"pk": self.object.pk})
 
 
+def get_recent_notes_count():
+    """Return the number of recent notes given forms on the update page, or None to give every note a form"""
+    return getattr(settings, "PROSDIB_RECENT_NOTES", None)
+
+
+def get_recent_note_pks(project, count):
+    """Return the pks of the current notes and the count most recent notes of a project"""
+    notes = project.projectnote_set.all()
+    # ordered as ProjectProjectNoteList, so notes with the same when are split the same way
+    recent_pks = list(notes.order_by("-when", "-pk").values_list("pk", flat=True)[:count])
+    return recent_pks + [
+        pk for pk in notes.filter(is_current=True).values_list("pk", flat=True) if pk not in recent_pks
+    ]
+
+
 class ProjectUpdate(PermissionRequiredMixin, UpdateView):
     permission_required = "prosdib.change_project"
 
     model = Project
     form_class = ProjectForm
 
-    def get_context_data(self, **kwargs):
-        context_data = super().get_context_data(**kwargs)
+    def get_projectnote_formset(self):
+        recent_notes_count = get_recent_notes_count()
+        if recent_notes_count is None:
+            if self.request.POST:
+                return ProjectProjectNoteFormset(self.request.POST, instance=self.object)
+            return ProjectProjectNoteFormset(instance=self.object, initial=[{"submitted_by": self.request.user}])
 
+        prefix = ProjectProjectNoteRecentFormset.get_default_prefix()
         if self.request.POST:
-            context_data["projectnotes"] = ProjectProjectNoteFormset(
-                self.request.POST, instance=self.object
+            # only the notes which were rendered are posted back, so only those are loaded and validated
+            pks = [
+                value for key, value in self.request.POST.items()
+                if key.startswith(f"{prefix}-") and key.endswith("-id") and value.isdigit()
+            ]
+            return ProjectProjectNoteRecentFormset(
+                self.request.POST,
+                instance=self.object,
+                queryset=ProjectNote.objects.filter(pk__in=pks),
             )
+
+        return ProjectProjectNoteRecentFormset(
+            instance=self.object,
+            queryset=ProjectNote.objects.filter(
+                pk__in=get_recent_note_pks(self.object, recent_notes_count)
+            ).order_by("-when", "-pk"),
+            initial=[{"submitted_by": self.request.user}],
+        )
+
+    def get_context_data(self, **kwargs):
+        context_data = super().get_context_data(**kwargs)
+
+        context_data["projectnotes"] = self.get_projectnote_formset()
+        context_data["recent_notes_only"] = get_recent_notes_count() is not None
+        if context_data["recent_notes_only"]:
+            context_data["shown_projectnotes"] = [
+                projectnoteform.instance for projectnoteform in context_data["projectnotes"].initial_forms
+            ]
         else:
-            context_data["projectnotes"] = ProjectProjectNoteFormset(
-                instance=self.object, initial=[{"submitted_by": self.request.user}]
-            )
+            context_data["shown_projectnotes"] = self.object.projectnote_set.all()
 
         return context_data
 
+    @transaction.atomic
     def form_valid(self, form):
+        # the notes are validated before anything is saved so an invalid formset leaves the project unchanged
+        projectnotes = self.get_projectnote_formset() if self.request.POST else None
+        if projectnotes is not None and not projectnotes.is_valid():
+            return self.form_invalid(form)
+
+        history = HistoryRecorder(self.request.user)
+        history.add_form(form, "Project")
+
         response = super().form_valid(form)
 
         self.object = form.save(commit=False)
-        technician, created = Technician.objects.get_or_create(
-            user=self.request.user,
-            defaults={"name": self.request.user.__str__()},
-        )
+        technician = get_request_technician(self.request, create=True)
         self.object.submitted_by = technician
 
         self.object = form.save()
 
-        if self.request.POST:
-            projectnotes = ProjectProjectNoteFormset(
-                self.request.POST, instance=self.object
-            )
+        if "recipient_emails" in self.request.POST:
+            form.save_subscriptions(self.object)
 
-            if (projectnotes).is_valid():
-                for form in projectnotes.forms:
-                    projectnote = form.save(commit=False)
-                    if projectnote.submitted_by is None:
-                        projectnote.submitted_by = technician
-                projectnotes.save()
-            else:
-                return self.form_invalid(form)
+        if projectnotes is not None:
+            history.add_formset(projectnotes, "ProjectNote")
+            for projectnoteform in projectnotes.forms:
+                projectnote = projectnoteform.save(commit=False)
+                if projectnote.submitted_by is None:
+                    projectnote.submitted_by = technician
+            projectnotes.save()
 
-        else:
-            projectnotes = ProjectProjectNoteFormset(instance=self.object)
+        history.save()
 
         if "send_mail" in self.request.POST:
             send_project_mail(self.object, self.request, is_new=False)
@@ -295,10 +420,23 @@ class ProjectUpdate(PermissionRequiredMixin, UpdateView):
         return reverse_lazy("prosdib:project-detail", kwargs={"pk": self.object.pk})
 
 
-class ProjectDetail(PermissionRequiredMixin, DetailView):
+class ProjectDetail(PermissionRequiredMixin, ConditionalGetMixin, DetailView):
     permission_required = "prosdib.view_project"
     model = Project
 
+    def get_validators(self):
+        project = (
+            Project.objects.filter(pk=self.kwargs["pk"])
+            .values("version", "updated_at")
+            .first()
+        )
+        if project is None:
+            return None, None
+
+        # the page shows links depending on the user's permissions
+        etag = f"project-{self.kwargs['pk']}-{project['version']}-user-{self.request.user.pk}"
+        return etag, project["updated_at"]
+
     def get_context_data(self, **kwargs):
         context_data = super().get_context_data(**kwargs)
         context_data["project_labels"] = {
@@ -346,10 +484,24 @@ class ProjectSoftDelete(PermissionRequiredMixin, UpdateView):
         return context_data
 
 
-class ProjectList(PermissionRequiredMixin, ListView):
+class VistaProjectQuerySet(ProjectQuerySet):
+    """The queryset filtered by the ProjectList vista, with status__is_active lookups answered by the status registry"""
+
+    def filter(self, *args, **kwargs):
+        args, kwargs = rewrite_status_lookups(args, kwargs)
+        return super().filter(*args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        args, kwargs = rewrite_status_lookups(args, kwargs)
+        return super().exclude(*args, **kwargs)
+
+
+class ProjectList(PermissionRequiredMixin, ConditionalGetMixin, ListView):
     permission_required = "prosdib.view_project"
     model = Project
     paginate_by = 30
+    # with PROSDIB_KEYSET_PAGINATION, pages are always sorted by these fields and linked by cursors
+    keyset_ordering = ("latest_update_when", "priority", "pk")
 
     def setup(self, request, *args, **kwargs):
         self.vista_settings = {
@@ -408,8 +560,46 @@ class ProjectList(PermissionRequiredMixin, ListView):
     def post(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+
+        response = self.get_conditional_response(request)
+        if response is not None:
+            return response
+
+        context = self.get_context_data()
+        response = self.add_validator_headers(self.render_to_response(context))
+        # the vista, and so the page, depends on the user and the session as well as the url
+        patch_vary_headers(response, ["Cookie"])
+        return response
+
+    def get_validators(self):
+        # a change to a listed project, or a project entering or leaving the filtered list,
+        # changes the latest updated_at or the count of the filtered projects
+        projects = (
+            self.object_list.order_by()
+            .select_related(None)
+            .prefetch_related(None)
+            .aggregate(latest_updated_at=Max("updated_at"), qty=Count("pk"))
+        )
+        # the paginator reads the count from here instead of counting the projects again
+        cache.set(self.get_count_cache_key(), projects["qty"], get_count_timeout())
+
+        fingerprint = "|".join(
+            [
+                str(self.request.user.pk),
+                self.vistaobj["querydict"].urlencode(),
+                self.request.GET.urlencode(),
+                str(projects["latest_updated_at"]),
+                str(projects["qty"]),
+            ]
+        )
+        etag = "project-list-" + hashlib.md5(fingerprint.encode()).hexdigest()
+
+        return etag, projects["latest_updated_at"]
+
     def get_queryset(self, **kwargs):
-        queryset = super().get_queryset()
+        queryset = VistaProjectQuerySet(model=self.model).with_activity()
 
         self.vistaobj = {
             "querydict": QueryDict(),
@@ -417,7 +607,34 @@ class ProjectList(PermissionRequiredMixin, ListView):
             "model_name": "Project",
         }
 
-        return get_vista_queryset(self)
+        return self.get_column_queryset(get_vista_queryset(self))
+
+    def column_is_shown(self, column):
+        # as in project_list.html, no selected columns means all columns are shown
+        show_columns = self.vistaobj["querydict"].getlist("show_columns")
+        return not show_columns or column in show_columns
+
+    def get_column_queryset(self, queryset):
+        """Load only what the visible columns of project_list.html need"""
+        queryset = queryset.defer("latest_update_text")
+
+        if not self.column_is_shown("description"):
+            queryset = queryset.defer("description")
+        if not self.column_is_shown("time_spent"):
+            queryset = queryset.defer("time_spent_total")
+
+        related = [
+            field_name
+            for field_name in ["technician", "status"]
+            if self.column_is_shown(field_name)
+        ]
+        if related:
+            queryset = queryset.select_related(*related)
+
+        if self.column_is_shown("notes"):
+            queryset = queryset.prefetch_related(get_current_notes_prefetch())
+
+        return queryset
 
     def get_paginate_by(self, queryset):
         if (
@@ -428,13 +645,57 @@ class ProjectList(PermissionRequiredMixin, ListView):
 
         return super().get_paginate_by(self)
 
+    def get_count_cache_key(self):
+        # only the filters affect the count
+        querydict = self.vistaobj["querydict"].copy()
+        for key in ["order_by", "paginate_by", "show_columns"]:
+            querydict.pop(key, None)
+
+        return make_cache_key("prosdib:project-list-count", querydict)
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return CachedCountPaginator(
+            queryset,
+            per_page,
+            count_cache_key=self.get_count_cache_key(),
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            **kwargs,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not getattr(settings, "PROSDIB_KEYSET_PAGINATION", False):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(
+            queryset,
+            page_size,
+            self.keyset_ordering,
+            count_cache_key=self.get_count_cache_key(),
+        )
+        page = paginator.page(self.request.GET.get("cursor"))
+
+        return (paginator, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self, **kwargs):
         context_data = super().get_context_data(**kwargs)
 
+        context_data["keyset_pagination"] = getattr(
+            settings, "PROSDIB_KEYSET_PAGINATION", False
+        )
+
         vista_data = vista_context_data(self.vista_settings, self.vistaobj["querydict"])
 
         context_data = {**context_data, **vista_data}
 
+        # rows are cached per project version and set of visible columns
+        context_data["row_cache_timeout"] = getattr(
+            settings, "PROSDIB_ROW_CACHE_TIMEOUT", 600
+        )
+        context_data["row_cache_columns"] = ",".join(
+            sorted(context_data.get("show_columns") or [])
+        )
+
         context_data["vistas"] = Vista.objects.filter(
             user=self.request.user, model_name="libtekin.project"
         ).all()  # for choosing saved vistas
@@ -445,22 +706,76 @@ class ProjectList(PermissionRequiredMixin, ListView):
         return context_data
 
 
+class ProjectExport(ProjectList):
+    """Stream the projects selected by the same vista as ProjectList as CSV or JSON Lines
+
+    Use ?format=jsonl for JSON Lines and ?notes=1 to include the notes of each project
+    """
+
+    def get_column_queryset(self, queryset):
+        queryset = queryset.select_related("technician", "created_by", "status").prefetch_related("subscriptions")
+        if self.request.GET.get("notes"):
+            queryset = queryset.prefetch_related("projectnote_set__submitted_by")
+
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        include_notes = bool(request.GET.get("notes"))
+        # from Django 4.1, iterator() applies prefetch_related to each chunk
+        projects = self.get_queryset().iterator(
+            chunk_size=getattr(settings, "PROSDIB_EXPORT_CHUNK_SIZE", 2000)
+        )
+
+        if request.GET.get("format") == "jsonl":
+            response = StreamingHttpResponse(
+                export_jsonl_rows(projects, include_notes),
+                content_type="application/x-ndjson",
+            )
+            extension = "jsonl"
+        else:
+            response = StreamingHttpResponse(
+                export_csv_rows(projects, include_notes), content_type="text/csv"
+            )
+            extension = "csv"
+
+        response["Content-Disposition"] = f'attachment; filename="projects.{extension}"'
+        return response
+
+    def post(self, request, *args, **kwargs):
+        return self.get(request, *args, **kwargs)
+
+
+class ProjectSearch(PermissionRequiredMixin, TemplateView):
+    permission_required = "prosdib.view_project"
+    template_name = "prosdib/project_search.html"
+
+    def get_context_data(self, **kwargs):
+        context_data = super().get_context_data(**kwargs)
+        context_data["q"] = self.request.GET.get("q", "")
+        context_data["results"] = search_projects(context_data["q"])
+
+        return context_data
+
+
 class ProjectProjectNoteCreate(PermissionRequiredMixin, CreateView):
     permission_required = "prosdib.add_projectnote"
     model = ProjectNote
     form_class = ProjectProjectNoteForm
     template_name = "prosdib/projectprojectnote_form.html"
 
+    @transaction.atomic
     def form_valid(self, form):
+        history = HistoryRecorder(self.request.user)
+        history.add_form(form, "ProjectNote")
+
         self.object = form.save(commit=False)
         self.object.project = Project.objects.get(pk=self.kwargs.get("projectpk"))
-        technician, created = Technician.objects.get_or_create(
-            user=self.request.user,
-            defaults={"name": self.request.user.__str__()},
-        )
+        technician = get_request_technician(self.request, create=True)
         self.object.submitted_by = technician
         self.object.save()
 
+        history.save()
+
         if "send_mail" in self.request.POST:
             send_project_mail(self.object.project, self.request, is_new=False)
 
@@ -538,3 +853,150 @@ class TechnicianClose(PermissionRequiredMixin, DetailView):
     permission_required = "prosdib.view_technician"
     model = Technician
     template_name = "prosdib/technician_closer.html"
+
+
+class ProjectProjectNoteList(PermissionRequiredMixin, ListView):
+    """The notes of a project which are not shown on its update page, as table rows loaded on demand"""
+
+    permission_required = "prosdib.view_project"
+    model = ProjectNote
+    paginate_by = 25
+    template_name = "prosdib/projectprojectnote_list.html"
+
+    def get_queryset(self):
+        notes = ProjectNote.objects.filter(project_id=self.kwargs["projectpk"]).order_by("-when", "-pk")
+        recent_notes_count = get_recent_notes_count()
+        if recent_notes_count is not None:
+            project = Project(pk=self.kwargs["projectpk"])
+            notes = notes.exclude(pk__in=get_recent_note_pks(project, recent_notes_count))
+
+        return notes
+
+
+class SubscriptionList(PermissionRequiredMixin, ListView):
+    """The projects to which the user is subscribed, by account or by email
+
+    Posting a list of project pks with action=subscribe or action=unsubscribe changes the user's subscriptions to all of them at once
+    """
+
+    permission_required = "prosdib.view_project"
+    model = Subscription
+    paginate_by = 50
+    template_name = "prosdib/subscription_list.html"
+
+    def get_queryset(self):
+        return (
+            Subscription.objects.for_user(self.request.user)
+            .select_related("project__status", "project__technician")
+            .order_by("project__title", "email")
+        )
+
+    def post(self, request, *args, **kwargs):
+        form = SubscriptionChangeForm(request.POST)
+
+        if not form.is_valid():
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f"{field}: {error}")
+        elif form.cleaned_data["action"] == "subscribe":
+            if request.user.email:
+                Subscription.objects.subscribe(form.cleaned_data["project"], [request.user.email])
+            else:
+                messages.error(request, "Your account has no email address to subscribe")
+        else:
+            Subscription.objects.for_user(request.user).filter(project__in=form.cleaned_data["project"]).remove()
+
+        return HttpResponseRedirect(reverse("prosdib:subscription-list"))
+
+
+class AutocompleteView(PermissionRequiredMixin, View):
+    """Answer ?q=<term>&page=<number> with a page of matching choices as json, for AutocompleteSelect
+
+    Subclasses set model, the search_fields matched against the start of the term, the ordering,
+    and the relations to select_related for get_result.
+
+    The response is {"results": [{"id": ..., "text": ...}, ...], "more": true or false}.  One more row than
+    the page size is read to tell if there are more, so no count query is made
+    """
+
+    model = None
+    search_fields = ()
+    ordering = ("pk",)
+    select_related = ()
+    page_size = 20
+
+    def get_queryset(self, term):
+        queryset = self.model._default_manager.select_related(*self.select_related).order_by(*self.ordering)
+        if term:
+            condition = Q()
+            for field_name in self.search_fields:
+                condition = condition | Q(**{f"{field_name}__istartswith": term})
+            queryset = queryset.filter(condition)
+
+        return queryset
+
+    def get_result(self, obj):
+        return {"id": obj.pk, "text": str(obj)}
+
+    def get(self, request, *args, **kwargs):
+        term = request.GET.get("q", "").strip()
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+
+        start = (page - 1) * self.page_size
+        objects = list(self.get_queryset(term)[start:start + self.page_size + 1])
+
+        return JsonResponse(
+            {
+                "results": [self.get_result(obj) for obj in objects[: self.page_size]],
+                "more": len(objects) > self.page_size,
+            }
+        )
+
+
+class ItemAutocomplete(AutocompleteView):
+    permission_required = "libtekin.view_item"
+    model = Item
+    search_fields = ("primary_id", "home__short_name", "assignee__friendly_name")
+    ordering = ("primary_id", "pk")
+    select_related = ("home", "assignee")
+
+    def get_result(self, item):
+        result = super().get_result(item)
+        if item.home is not None:
+            result["home"] = item.home.pk
+            result["home_name"] = item.home.short_name
+        if item.assignee is not None:
+            result["assignee_name"] = item.assignee.friendly_name
+
+        return result
+
+
+class UserAutocomplete(AutocompleteView):
+    permission_required = "prosdib.view_technician"
+    model = get_user_model()
+    search_fields = (get_user_model().USERNAME_FIELD, "email")
+    ordering = (get_user_model().USERNAME_FIELD, "pk")
+
+
+class HistoryList(PermissionRequiredMixin, ListView):
+    permission_required = "prosdib.view_history"
+    model = History
+    paginate_by = 50
+    template_name = "prosdib/history_list.html"
+
+    def get_queryset(self):
+        return (
+            History.objects.for_object(self.kwargs["modelname"], self.kwargs["objectid"])
+            .select_related("user")
+        )
+
+    def get_context_data(self, **kwargs):
+        context_data = super().get_context_data(**kwargs)
+        context_data["object_list"].resolve_objects()
+        if context_data["object_list"]:
+            context_data["history_object"] = context_data["object_list"][0].get_object()
+
+        return context_data